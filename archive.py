@@ -0,0 +1,121 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse, parse_qsl, urlencode
+from cache import cache_dir
+
+# ----- URL NORMALIZATION -----
+TRAILING = ".,;:!?'\"»"
+BRACKETS = ("()", "[]", "{}", "<>")
+
+def clean_url(url):
+    # Retire la ponctuation collée à l'URL quand on la copie depuis un texte
+    url = url.rstrip(TRAILING)
+    changed = True
+    while changed:
+        changed = False
+        for opening, closing in BRACKETS:
+            if url.endswith(closing) and url.count(closing) > url.count(opening):
+                url = url[:-1].rstrip(TRAILING)
+                changed = True
+    return url
+
+YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+YOUTUBE_ID = re.compile(r"^[\w-]{11}$")
+TRACKING_PARAMS = {"fbclid", "gclid", "si", "feature", "pp"}
+
+def media_key(url):
+    # (extracteur, id) dans le même format que les info dicts de yt-dlp (extractor_key en minuscules)
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    path = parsed.path
+    video_id = None
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+    elif host in YOUTUBE_HOSTS:
+        video_id = dict(parse_qsl(parsed.query)).get("v")
+        match = re.match(r"^/(?:shorts|embed|live|v)/([\w-]+)", path)
+        if not video_id and match:
+            video_id = match.group(1)
+    if video_id and YOUTUBE_ID.match(video_id):
+        return ("youtube", video_id)
+
+    match = re.match(r"^/(?:video/)?(\d+)", path)
+    if host in ("vimeo.com", "player.vimeo.com") and match:
+        return ("vimeo", match.group(1))
+    match = re.match(r"^/(?:video/)?([a-z0-9]+)", path)
+    if host in ("dailymotion.com", "dai.ly") and match:
+        return ("dailymotion", match.group(1))
+
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query)
+                   if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS)
+    generic = host + path.rstrip("/") + ("?" + urlencode(query) if query else "")
+    return ("url", generic)
+
+def info_key(info):
+    extractor = info.get("extractor_key") or info.get("extractor") or "generic"
+    return (extractor.lower(), str(info.get("id")))
+
+def info_path(info):
+    downloads = info.get("requested_downloads") or [{}]
+    return downloads[0].get("filepath") or info.get("filepath") or info.get("_filename")
+
+# ----- DOWNLOAD INDEX -----
+class DownloadIndex:
+    # Index persistant des médias déjà téléchargés, par (extracteur, id, variante)
+    CHUNK = 300
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache_dir(), "downloads.sqlite")
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._db:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS downloads (extractor TEXT, video_id TEXT, "
+                                 "variant TEXT, url TEXT, path TEXT, completed REAL, "
+                                 "PRIMARY KEY (extractor, video_id, variant)) WITHOUT ROWID")
+        except sqlite3.Error:
+            self._db = None
+
+    def completed(self, keys, variant):
+        # Requêtes groupées par extracteur et par paquets de CHUNK ids (index de la clé primaire) :
+        # quasi instantané même pour des dizaines de milliers d'URLs
+        done = set()
+        if self._db is None:
+            return done
+        by_extractor = {}
+        for extractor, video_id in keys:
+            by_extractor.setdefault(extractor, []).append(video_id)
+        with self._lock:
+            for extractor, ids in by_extractor.items():
+                for i in range(0, len(ids), self.CHUNK):
+                    chunk = ids[i:i + self.CHUNK]
+                    marks = ",".join("?" for _ in chunk)
+                    try:
+                        rows = self._db.execute("SELECT video_id, path FROM downloads WHERE extractor = ? "
+                                                f"AND video_id IN ({marks}) AND variant = ?",
+                                                [extractor, *chunk, variant]).fetchall()
+                    except sqlite3.Error:
+                        return done
+                    for video_id, path in rows:
+                        # Fichier supprimé depuis : on le retélécharge
+                        if not path or os.path.exists(path):
+                            done.add((extractor, video_id))
+        return done
+
+    def add(self, keys, variant, url, path=None):
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+                                         [(k[0], k[1], variant, url, path, now) for k in set(keys)])
+            except sqlite3.Error:
+                pass
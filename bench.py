@@ -0,0 +1,278 @@
+import os
+import sys
+import time
+import queue
+import collections
+import platform
+import tempfile
+import threading
+import functools
+import http.server
+from engine import run_ffmpeg, progress_args, CompressionEngine, ConversionEngine, DownloadEngine
+from archive import DownloadIndex
+from tools import capabilities
+from profiles import PROFILES, get_profile, video_args, audio_args
+
+# ----- PROFILE BENCHMARK -----
+def profile_benchmark(ffmpeg_path, names=None, duration=5, size="1280x720", rate=30, log=print):
+    # Encode une mire lavfi synthétique avec chaque profil : fps d'encodage et taille produite
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names or list(PROFILES):
+            profile = get_profile(name)
+            out = os.path.join(tmp, f"{name}.mp4")
+            cmd = [ffmpeg_path, "-y", *progress_args(),
+                   "-f", "lavfi", "-i", f"testsrc2=duration={duration}:size={size}:rate={rate}",
+                   "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                   *video_args(profile), "-crf", str(profile["crf"]), *audio_args(profile),
+                   "-shortest", out]
+            log(f"⏱️ Profil {name} ({profile['codec']} {profile['preset']})...")
+            start = time.perf_counter()
+            returncode, tail = run_ffmpeg(cmd, duration)
+            elapsed = time.perf_counter() - start
+            result = {
+                "profile": name,
+                "codec": profile["codec"],
+                "preset": profile["preset"],
+                "returncode": returncode,
+                "seconds": round(elapsed, 3),
+                "fps": round(duration * rate / elapsed, 1) if returncode == 0 else 0,
+                "bytes": os.path.getsize(out) if returncode == 0 and os.path.isfile(out) else 0,
+                "error": tail[-1] if returncode != 0 and tail else "",
+            }
+            if returncode == 0:
+                log(f"  {result['fps']} fps | {result['bytes'] / 1024:.0f} Ko | {result['seconds']}s")
+            else:
+                log(f"  ❌ {result['error']}")
+            results.append(result)
+    return results
+
+# ----- BENCHMARK SUITE -----
+# Mesures reproductibles des trois moteurs sur des médias synthétiques (lavfi), téléchargements
+# servis par un serveur HTTP local. Résultats en JSON pour comparer les versions.
+def make_media(ffmpeg_path, folder, count=4, duration=5, size="640x360", rate=30):
+    # Fichiers tous différents (fréquence du son) : aucun cache ne peut les confondre
+    paths = []
+    for i in range(count):
+        out = os.path.join(folder, f"clip{i:03d}.mp4")
+        cmd = [ffmpeg_path, "-y", *progress_args(),
+               "-f", "lavfi", "-i", f"testsrc2=duration={duration}:size={size}:rate={rate}",
+               "-f", "lavfi", "-i", f"sine=frequency={220 + 20 * i}:duration={duration}",
+               "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", out]
+        returncode, tail = run_ffmpeg(cmd, duration)
+        if returncode != 0:
+            raise RuntimeError(tail[-1] if tail else f"ffmpeg code {returncode}")
+        paths.append(out)
+    return paths
+
+def peak_rss():
+    # Pic de mémoire résidente (octets) du processus et des ffmpeg terminés ; None sous Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale}
+
+class LoopProbe:
+    # Remplace la boucle Tk : réveil toutes les FRAME_MS, vidage de la file de logs, mesure du retard.
+    # Un retard élevé = threads de travail qui privent l'interface du GIL ou logs trop abondants.
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.lateness = []
+        self.messages = 0
+        self.tail = collections.deque(maxlen=5)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def log(self, msg):
+        self._queue.put(msg)
+
+    def _run(self):
+        expected = time.perf_counter() + self.interval
+        while not self._stop.wait(max(0.0, expected - time.perf_counter())):
+            now = time.perf_counter()
+            self.lateness.append(now - expected)
+            self._drain()
+            expected = now + self.interval
+
+    def _drain(self):
+        while True:
+            try:
+                self.tail.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            self.messages += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._drain()
+
+    def stats(self):
+        if not self.lateness:
+            return {"ticks": 0, "messages": self.messages}
+        ordered = sorted(self.lateness)
+        return {
+            "ticks": len(ordered),
+            "messages": self.messages,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+def measure(run, log=print):
+    # run(probe_log) -> dict de mesures propres au moteur ; ajoute durée, RSS et latence de boucle
+    with LoopProbe() as probe:
+        start = time.perf_counter()
+        try:
+            result = run(probe.log)
+        except Exception as e:
+            result = {"error": str(e)}
+        elapsed = time.perf_counter() - start
+    result.update(seconds=round(elapsed, 3), peak_rss=peak_rss(), ui_loop=probe.stats())
+    if result.get("ok") is False:
+        # Derniers messages du moteur : la cause de l'échec
+        result["log_tail"] = list(probe.tail)
+    for key in ("files_per_s", "fps", "bytes_per_s"):
+        if key in result:
+            log(f"  {key} : {result[key]}")
+    if result.get("error"):
+        log(f"  ❌ {result['error']}")
+    return result
+
+def compress_benchmark(ffmpeg_path, source, dest, duration, rate, size_mb=1, log=print):
+    def run(probe_log):
+        start = time.perf_counter()
+        ok = CompressionEngine(ffmpeg_path, log=probe_log).compress(source, dest, size_mb)
+        elapsed = time.perf_counter() - start
+        return {"ok": ok, "fps": round(duration * rate / elapsed, 1),
+                "bytes_per_s": int(os.path.getsize(source) / elapsed)}
+    log(f"⏱️ Compression à {size_mb} Mo...")
+    return measure(run, log)
+
+def convert_benchmark(ffmpeg_path, folder, dest, out_fmt, log=print):
+    def run(probe_log):
+        files = [e.path for e in os.scandir(folder) if e.is_file()]
+        size = sum(os.path.getsize(f) for f in files)
+        start = time.perf_counter()
+        ok = ConversionEngine(ffmpeg_path, log=probe_log).convert_folder(folder, out_fmt, dest)
+        elapsed = time.perf_counter() - start
+        return {"ok": ok, "format": out_fmt, "files": len(files),
+                "files_per_s": round(len(files) / elapsed, 2), "bytes_per_s": int(size / elapsed)}
+    log(f"⏱️ Conversion de dossier → {out_fmt}...")
+    return measure(run, log)
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        try:
+            super().copyfile(source, outputfile)
+        except (BrokenPipeError, ConnectionResetError):
+            # Le client a coupé (extraction qui ne lit que le début du fichier)
+            pass
+
+def serve_folder(folder, handler_class=QuietHandler):
+    # Serveur HTTP local (port libre) qui sert les médias synthétiques comme « téléchargements »
+    handler = functools.partial(handler_class, directory=folder)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def download_benchmark(ffmpeg_path, folder, dest, workers=4, log=print):
+    def run(probe_log):
+        files = sorted(e.name for e in os.scandir(folder) if e.is_file())
+        size = sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+        server = serve_folder(folder)
+        try:
+            host, port = server.server_address
+            urls = [f"http://{host}:{port}/{name}" for name in files]
+            engine = DownloadEngine(ffmpeg_path, workers=workers, per_host=workers, log=probe_log,
+                                    index=DownloadIndex(os.path.join(dest, "index.sqlite")),
+                                    skip_done=False, retries=0)
+            start = time.perf_counter()
+            ok = engine.download(urls, dest, "best", "both")
+            elapsed = time.perf_counter() - start
+            engine.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        return {"ok": ok, "files": len(files), "workers": workers,
+                "files_per_s": round(len(files) / elapsed, 2), "bytes_per_s": int(size / elapsed)}
+    log(f"⏱️ Téléchargement local ({workers} en parallèle)...")
+    return measure(run, log)
+
+SUITES = ("profiles", "compress", "convert", "download")
+
+def ffmpeg_version(ffmpeg_path):
+    # Lu avant l'isolation des caches : le cache des capacités reste celui de l'utilisateur
+    caps = capabilities(ffmpeg_path)
+    return caps["banner"] if caps else ""
+
+def run_suite(ffmpeg_path, suites=None, files=8, duration=5, size="640x360", rate=30, profiles=None, log=print):
+    suites = suites or SUITES
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version(ffmpeg_path),
+        "params": {"files": files, "duration": duration, "size": size, "rate": rate},
+        "results": {},
+    }
+    results = report["results"]
+    previous = os.environ.get("VIDEOTOOL_CACHE")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Caches (sondes, journal, index) isolés : chaque exécution part de zéro
+        os.environ["VIDEOTOOL_CACHE"] = os.path.join(tmp, "cache")
+        try:
+            media = os.path.join(tmp, "media")
+            os.makedirs(media)
+            log(f"🎞️ Génération de {files} médias synthétiques ({duration}s, {size})...")
+            try:
+                clips = make_media(ffmpeg_path, media, files, duration, size, rate)
+            except (OSError, RuntimeError) as e:
+                log(f"❌ {e}")
+                report["error"] = str(e)
+                return report
+            for name in suites:
+                out = os.path.join(tmp, name)
+                os.makedirs(out)
+                if name == "profiles":
+                    results[name] = profile_benchmark(ffmpeg_path, profiles, duration, size, rate, log=log)
+                elif name == "compress":
+                    results[name] = compress_benchmark(ffmpeg_path, clips[0], out, duration, rate, log=log)
+                elif name == "convert":
+                    # mkv : remux (débit disque) ; webm : transcodage complet (débit CPU)
+                    results[name] = {}
+                    for fmt in ("mkv", "webm"):
+                        os.makedirs(os.path.join(out, fmt))
+                        results[name][fmt] = convert_benchmark(ffmpeg_path, media, os.path.join(out, fmt), fmt, log)
+                elif name == "download":
+                    results[name] = download_benchmark(ffmpeg_path, media, out, log=log)
+        finally:
+            if previous is None:
+                os.environ.pop("VIDEOTOOL_CACHE", None)
+            else:
+                os.environ["VIDEOTOOL_CACHE"] = previous
+    return report
+
+def suite_failures(report):
+    failures = 1 if report.get("error") else 0
+    for name, result in report["results"].items():
+        if name == "profiles":
+            items = result
+        elif name == "convert":
+            items = list(result.values())
+        else:
+            items = [result]
+        failures += sum(1 for item in items if item.get("error") or item.get("returncode") or item.get("ok") is False)
+    return failures
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# ----- CACHE DIR -----
+def cache_dir():
+    # VIDEOTOOL_CACHE force l'emplacement ; sinon dossier cache utilisateur
+    path = os.environ.get("VIDEOTOOL_CACHE")
+    if not path:
+        base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+                or os.path.join(os.path.expanduser("~"), ".cache"))
+        path = os.path.join(base, "videotool")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# ----- DISK CACHE -----
+class DiskCache:
+    # Clé -> valeur JSON dans SQLite, éviction LRU au-delà de max_entries, TTL optionnel
+    EVICT_EVERY = 100
+
+    def __init__(self, name, max_entries=10000, ttl=None, folder=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = os.path.join(folder or cache_dir(), name + ".sqlite")
+        self._lock = threading.Lock()
+        self._writes = 0
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._db:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, "
+                                 "created REAL, accessed REAL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        except sqlite3.Error:
+            # Cache indisponible (disque en lecture seule...) : on continue sans
+            self._db = None
+
+    def get(self, key):
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if self.ttl is not None and now - row[1] > self.ttl:
+                    with self._db:
+                        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                with self._db:
+                    self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError):
+                return None
+
+    def set(self, key, value):
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO entries (key, value, created, accessed) "
+                                     "VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now))
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._evict()
+            except sqlite3.Error:
+                pass
+
+    def delete(self, key):
+        if self._db is None:
+            return
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        with self._db:
+            self._db.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                             "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import threading
+import collections
+from bench import QuietHandler, serve_folder
+from session import YDLSession, BandwidthBudget
+from engine import DownloadEngine
+from archive import DownloadIndex
+
+# Vérification de YDLSession contre un serveur HTTP local qui sert de faux médias (yt-dlp requis) :
+#   python check_session.py
+# - une seule instance YoutubeDL par jeu d'options, réutilisée d'un téléchargement à l'autre ;
+# - une seule extraction par URL, y compris en mode playlist (stream_urls puis téléchargement) ;
+# - débit partagé : chaque téléchargement HTTP simple reçoit sa part entière.
+
+FILES = 3
+SIZE = 256 * 1024
+
+class CountingHandler(QuietHandler):
+    hits = collections.Counter()
+    lock = threading.Lock()
+
+    def send_head(self):
+        with self.lock:
+            self.hits[self.path] += 1
+        return super().send_head()
+
+def check(label, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ""), flush=True)
+    return ok
+
+def main():
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        media = os.path.join(tmp, "media")
+        dest = os.path.join(tmp, "dest")
+        os.makedirs(media)
+        os.makedirs(dest)
+        for i in range(FILES):
+            with open(os.path.join(media, f"clip{i}.mp4"), "wb") as f:
+                f.write(os.urandom(SIZE))
+        server = serve_folder(media, CountingHandler)
+        host, port = server.server_address
+        urls = [f"http://{host}:{port}/clip{i}.mp4" for i in range(FILES)]
+        opts = {"outtmpl": os.path.join(dest, "%(title)s.%(ext)s"), "quiet": True, "no_warnings": True,
+                "noprogress": True}
+        try:
+            # Téléchargements directs : instance réutilisée, une requête d'extraction + une de téléchargement
+            budget = BandwidthBudget(10 * 1024 * 1024)
+            session = YDLSession(budget=budget)
+            rates = []
+
+            def on_progress(d):
+                if d["status"] == "downloading":
+                    rates.append(session._clients[0].ydl.params.get("ratelimit"))
+
+            for url in urls:
+                session.download(opts, url, on_progress)
+            ok &= check("une instance YoutubeDL pour tous les téléchargements", len(session._clients) == 1,
+                        f"{len(session._clients)} instance(s)")
+            written = sorted(os.listdir(dest))
+            ok &= check("fichiers téléchargés", len(written) == FILES, ", ".join(written))
+            ok &= check("part entière pour un téléchargement HTTP seul",
+                        bool(rates) and all(rate == budget.total for rate in rates), f"{sorted(set(rates))}")
+            before = sum(CountingHandler.hits.values())
+            session.info(next(iter(session._clients)).ydl, urls[0])
+            ok &= check("info en cache : aucune requête supplémentaire",
+                        sum(CountingHandler.hits.values()) == before)
+            session.close()
+
+            # Mode playlist : l'extraction faite par stream_urls est réutilisée par le téléchargement
+            CountingHandler.hits.clear()
+            opts["outtmpl"] = os.path.join(tmp, "playlist", "%(title)s.%(ext)s")
+            engine = DownloadEngine("", log=lambda msg: None, skip_done=False,
+                                    index=DownloadIndex(os.path.join(tmp, "index.sqlite")))
+            for url in engine.stream_urls(urls, "check"):
+                engine.session.download(opts, url)
+            engine.close()
+            per_file = [CountingHandler.hits[f"/clip{i}.mp4"] for i in range(FILES)]
+            ok &= check("mode playlist : une extraction + un téléchargement par URL",
+                        per_file == [2] * FILES, f"requêtes : {per_file}")
+        finally:
+            server.shutdown()
+            server.server_close()
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
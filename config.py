@@ -0,0 +1,255 @@
+import os
+import json
+import copy
+import atexit
+import tempfile
+import threading
+from profiles import DEFAULT_PROFILE, DEFAULT_AUDIO_FORMAT
+from session import parse_rate
+
+# ----- SCHEMA -----
+CONFIG_FILE = "config.json"
+SCHEMA_VERSION = 2
+
+# Clé -> (types acceptés, valeur par défaut). Les clés inconnues sont conservées telles quelles.
+SCHEMA = {
+    "ffmpeg_path": (str, ""),
+    "download_dest": (str, ""),
+    "compression_dest": (str, ""),
+    "conversion_dest": (str, ""),
+    "download_workers": (int, 4),
+    "download_per_host": (int, 2),
+    "download_fragments": (int, 4),
+    "download_retries": (int, 3),
+    "download_rate_limit": ((str, int, float, type(None)), None),
+    "audio_format": (str, DEFAULT_AUDIO_FORMAT),
+    "stream_size_mb": (int, 25),
+    "download_previews": (bool, False),
+    "encoder_profile": (str, DEFAULT_PROFILE),
+    "segmented_encoding": (bool, False),
+    "compression_previews": (bool, False),
+    "conversion_threads": (int, 2),
+    "conversion_workers": ((int, type(None)), None),
+    "conversion_recursive": (bool, False),
+    "preview_count": (int, 9),
+    "preview_width": (int, 320),
+    "preview_columns": (int, 3),
+    "metrics_jsonl": ((str, type(None)), None),
+    "metrics_prometheus": ((str, type(None)), None),
+    "profile_dir": ((str, type(None)), None),
+    "active_profile": (str, ""),
+    "profiles": (dict, {}),
+}
+
+# Réglages qu'un profil de job peut surcharger : concurrence, préréglages d'encodage, destinations
+PROFILE_KEYS = ("download_dest", "compression_dest", "conversion_dest", "download_workers", "download_per_host",
+                "download_fragments", "download_retries", "download_rate_limit", "audio_format", "stream_size_mb",
+                "download_previews", "encoder_profile", "segmented_encoding", "compression_previews",
+                "conversion_threads", "conversion_workers", "conversion_recursive", "preview_count",
+                "preview_width", "preview_columns")
+
+def coerce(key, value):
+    # Valeur conforme au schéma, convertie si possible ("4" -> 4, 1 -> True), sinon valeur par défaut
+    types, default = SCHEMA[key]
+    types = _as_tuple(types)
+    try:
+        if key == "download_rate_limit":
+            # Même syntaxe que --rate-limit ("10M", "500K", 5.5...) : validée, gardée telle quelle
+            return value if parse_rate(value) else None
+        if bool in types:
+            if isinstance(value, str):
+                return value.strip().lower() in ("1", "true", "yes", "on")
+            if value in (0, 1):
+                return bool(value)
+        elif isinstance(value, types) and not isinstance(value, bool):
+            return value
+        elif int in types and not isinstance(value, bool):
+            return int(value)
+    except (TypeError, ValueError):
+        pass
+    return copy.deepcopy(default)
+
+def _as_tuple(types):
+    return types if isinstance(types, tuple) else (types,)
+
+def validate(data):
+    clean = {key: coerce(key, value) if key in SCHEMA else value for key, value in data.items()}
+    profiles = {}
+    for name, values in clean.get("profiles", {}).items():
+        if isinstance(values, dict):
+            profiles[str(name)] = {key: coerce(key, value) for key, value in values.items() if key in PROFILE_KEYS}
+    clean["profiles"] = profiles
+    clean["version"] = SCHEMA_VERSION
+    return clean
+
+# ----- MIGRATIONS -----
+def _migrate_1(data):
+    # v1 : fichier plat sans version ni profils ; les dossiers vides valaient "non défini"
+    data.setdefault("profiles", {})
+    if data.get("download_rate_limit") == "":
+        data["download_rate_limit"] = None
+    return data
+
+MIGRATIONS = {1: _migrate_1}
+
+def file_version(data):
+    version = data.get("version", 1)
+    return version if isinstance(version, int) and not isinstance(version, bool) else 1
+
+def migrate(data):
+    version = file_version(data)
+    if version > SCHEMA_VERSION:
+        # Écrit par une version plus récente : valeurs lues, fichier jamais réécrit (voir ConfigStore)
+        return validate(copy.deepcopy(data)), False
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+    return validate(data), version != data.get("version")
+
+# ----- STORE -----
+class ConfigStore:
+    # Lue une seule fois, servie depuis la mémoire ; écritures regroupées (debounce) puis remplacement atomique
+    DELAY = 0.5
+
+    def __init__(self, path=CONFIG_FILE, delay=None):
+        self.path = path
+        self.delay = self.DELAY if delay is None else delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        # Fichier d'une version plus récente : modifications gardées en mémoire, rien n'est écrit
+        self.read_only = False
+        self._data, changed = self._load()
+        if changed:
+            self._schedule()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return validate({}), False
+        try:
+            data = json.loads(text) if text.strip() else {}
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            # Fichier corrompu : copie conservée à côté, puis valeurs par défaut
+            try:
+                os.replace(self.path, self.path + ".corrupt")
+            except OSError:
+                pass
+            return validate({}), True
+        self.read_only = file_version(data) > SCHEMA_VERSION
+        return migrate(data)
+
+    def get(self, key, default=None):
+        # Le profil actif surcharge la configuration de base
+        with self._lock:
+            profile = self._data["profiles"].get(self._data.get("active_profile"), {})
+            if key in profile:
+                return copy.deepcopy(profile[key])
+            value = self._data.get(key, default)
+            return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values=None, **kwargs):
+        values = dict(values or {}, **kwargs)
+        with self._lock:
+            # Profil actif : ses propres réglages sont modifiés, pas ceux de base qu'il masque
+            profile = self._data["profiles"].get(self._data.get("active_profile"))
+            for key, value in values.items():
+                target = profile if profile is not None and key in PROFILE_KEYS else self._data
+                target[key] = coerce(key, value) if key in SCHEMA else value
+            self._schedule()
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    # ----- JOB PROFILES -----
+    def profiles(self):
+        with self._lock:
+            return sorted(self._data["profiles"])
+
+    def profile(self, name):
+        # Configuration effective d'un profil nommé (KeyError s'il n'existe pas)
+        with self._lock:
+            values = {key: self._data.get(key, SCHEMA[key][1]) for key in PROFILE_KEYS}
+            values.update(self._data["profiles"][name])
+            return copy.deepcopy(values)
+
+    def save_profile(self, name, values=None):
+        # Sans valeurs : fige les réglages courants sous ce nom
+        with self._lock:
+            source = values if values is not None else {key: self.get(key) for key in PROFILE_KEYS}
+            self._data["profiles"][name] = {key: coerce(key, value) for key, value in source.items()
+                                            if key in PROFILE_KEYS}
+            self._schedule()
+
+    def delete_profile(self, name):
+        with self._lock:
+            self._data["profiles"].pop(name, None)
+            if self._data.get("active_profile") == name:
+                self._data["active_profile"] = ""
+            self._schedule()
+
+    def activate(self, name):
+        with self._lock:
+            if name and name not in self._data["profiles"]:
+                raise KeyError(name)
+            self._data["active_profile"] = name or ""
+            self._schedule()
+
+    # ----- PERSISTENCE -----
+    def _schedule(self):
+        # Une écriture au plus par délai, quel que soit le nombre de modifications entre-temps
+        if self.read_only:
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # Verrou d'écriture pris en premier : deux flush ne peuvent pas s'inverser sur le disque
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                text = json.dumps(self._data, indent=2, ensure_ascii=False)
+            # Fichier temporaire dans le même dossier puis os.replace : jamais de config.json à moitié écrit
+            folder = os.path.dirname(os.path.abspath(self.path))
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=folder)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except OSError:
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+                with self._lock:
+                    self._dirty = True
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def store_for(path=CONFIG_FILE):
+    # Une instance par fichier : l'interface et la CLI partagent la même vue en mémoire
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ConfigStore(path)
+            atexit.register(_stores[key].flush)
+        return _stores[key]
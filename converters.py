@@ -0,0 +1,236 @@
+import os
+import time
+import gzip
+import shutil
+import tarfile
+import zipfile
+import subprocess
+from engine import FORMAT_MAP
+
+# ----- CONVERTER REGISTRY -----
+# Conversions hors ffmpeg, par (type source, type cible). Chaque backend déclare combien
+# de conversions peuvent tourner en même temps (workers).
+CONVERTERS = {}
+
+def kind_of(ext):
+    ext = ext.lower().lstrip(".")
+    for kind, fmts in FORMAT_MAP.items():
+        if ext in fmts:
+            return kind
+    return None
+
+def register(src_kind, dst_kind, converter):
+    CONVERTERS.setdefault((src_kind, dst_kind), []).append(converter)
+
+def converter_for(src, out_fmt):
+    # Premier backend disponible qui gère ce couple de formats ; None = ffmpeg
+    ext = os.path.splitext(src)[1].lower().lstrip(".")
+    for converter in CONVERTERS.get((kind_of(ext), kind_of(out_fmt)), []):
+        if converter.supports(ext, out_fmt) and converter.available():
+            return converter
+    return None
+
+def unsupported(src, out_fmt):
+    # Types que ffmpeg ne sait pas traiter : sans backend, la conversion est impossible
+    return {kind_of(os.path.splitext(src)[1]), kind_of(out_fmt)} & {"doc", "archive"}
+
+class Converter:
+    # Valeurs par défaut des backends. Chaque backend définit aussi convert(src, out, out_fmt),
+    # qui écrit `out` ou lève une exception (message repris dans le log).
+    name = ""
+    workers = 1
+
+    def available(self):
+        return True
+
+    def supports(self, src_ext, out_fmt):
+        return True
+
+# ----- IMAGES (Pillow) -----
+class PillowConverter(Converter):
+    # En processus : pas de lancement de ffmpeg par image ; Pillow libère le GIL pendant le décodage
+    name = "pillow"
+    workers = os.cpu_count() or 1
+    SAVE_OPTIONS = {
+        "jpg": {"format": "JPEG", "quality": 90, "optimize": True},
+        "jpeg": {"format": "JPEG", "quality": 90, "optimize": True},
+        "png": {"format": "PNG"},
+        "gif": {"format": "GIF"},
+        "bmp": {"format": "BMP"},
+        "webp": {"format": "WEBP", "quality": 90, "method": 4},
+        "pdf": {"format": "PDF", "resolution": 150.0},
+    }
+    NO_ALPHA = {"jpg", "jpeg", "bmp", "pdf"}
+    ANIMATED = {"gif", "webp"}
+
+    def available(self):
+        try:
+            import PIL  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def supports(self, src_ext, out_fmt):
+        return out_fmt in self.SAVE_OPTIONS
+
+    def convert(self, src, out, out_fmt):
+        from PIL import Image
+        options = dict(self.SAVE_OPTIONS[out_fmt])
+        with Image.open(src) as img:
+            if getattr(img, "is_animated", False) and out_fmt in self.ANIMATED:
+                img.save(out, save_all=True, **options)
+                return
+            if out_fmt in self.NO_ALPHA and img.mode not in ("RGB", "L"):
+                if img.mode in ("RGBA", "LA", "P"):
+                    # Transparence aplatie sur fond blanc
+                    rgba = img.convert("RGBA")
+                    flat = Image.new("RGB", rgba.size, (255, 255, 255))
+                    flat.paste(rgba, mask=rgba.getchannel("A"))
+                    img = flat
+                else:
+                    img = img.convert("RGB")
+            img.save(out, **options)
+
+# ----- DOCUMENTS -----
+def find_tool(*names):
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+class OfficeConverter(Converter):
+    # LibreOffice sans interface ; une seule instance par profil utilisateur, donc pas de parallélisme
+    name = "libreoffice"
+    workers = 1
+    TARGETS = {
+        "pdf": {"docx", "xlsx", "pptx", "txt"},
+        "docx": {"txt"},
+        "txt": {"docx"},
+    }
+    WINDOWS_PATHS = [r"C:\Program Files\LibreOffice\program\soffice.exe",
+                     r"C:\Program Files (x86)\LibreOffice\program\soffice.exe"]
+
+    def binary(self):
+        return find_tool("soffice", "libreoffice") or next(
+            (path for path in self.WINDOWS_PATHS if os.path.isfile(path)), None)
+
+    def available(self):
+        return self.binary() is not None
+
+    def supports(self, src_ext, out_fmt):
+        return src_ext in self.TARGETS.get(out_fmt, ())
+
+    def convert(self, src, out, out_fmt):
+        # soffice écrit <nom>.<fmt> dans --outdir : dossier temporaire voisin puis renommage
+        workdir = out + ".soffice"
+        os.makedirs(workdir, exist_ok=True)
+        try:
+            target = "txt:Text" if out_fmt == "txt" else out_fmt
+            result = subprocess.run([self.binary(), "--headless", "--norestore", "--convert-to", target,
+                                     "--outdir", workdir, src], capture_output=True, text=True)
+            produced = os.path.join(workdir, os.path.splitext(os.path.basename(src))[0] + "." + out_fmt)
+            if result.returncode != 0 or not os.path.isfile(produced):
+                raise RuntimeError((result.stderr or result.stdout or "échec LibreOffice").strip())
+            os.replace(produced, out)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+class PdfTextConverter(Converter):
+    # pdftotext (poppler) : rapide, un processus par fichier
+    name = "pdftotext"
+    workers = max(1, (os.cpu_count() or 1) // 2)
+
+    def available(self):
+        return find_tool("pdftotext") is not None
+
+    def supports(self, src_ext, out_fmt):
+        return src_ext == "pdf" and out_fmt == "txt"
+
+    def convert(self, src, out, out_fmt):
+        result = subprocess.run([find_tool("pdftotext"), "-layout", "-enc", "UTF-8", src, out],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"code {result.returncode}")
+
+# ----- ARCHIVES -----
+def zipfile_time(info):
+    return time.mktime(info.date_time + (0, 0, -1))
+
+def zip_date(mtime):
+    # Le format zip ne représente pas les dates avant 1980
+    return max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
+
+class ArchiveConverter(Converter):
+    # Réempaquetage membre par membre, en flux : rien n'est extrait sur le disque.
+    # Lecture zip / tar / tar.gz / .gz simple ; écriture zip / tar / tar.gz (gz). 7z et rar : non gérés.
+    name = "archive"
+    workers = 2
+    READABLE = {"zip", "tar", "gz"}
+    WRITABLE = {"zip", "tar", "gz"}
+    CHUNK = 1024 * 1024
+
+    def supports(self, src_ext, out_fmt):
+        return src_ext in self.READABLE and out_fmt in self.WRITABLE
+
+    def members(self, src):
+        # Générateur (nom, taille, mtime, flux ouvert ou None pour un dossier)
+        if zipfile.is_zipfile(src):
+            with zipfile.ZipFile(src) as archive:
+                for info in archive.infolist():
+                    mtime = zipfile_time(info)
+                    if info.is_dir():
+                        yield info.filename, 0, mtime, None
+                    else:
+                        with archive.open(info) as stream:
+                            yield info.filename, info.file_size, mtime, stream
+        elif tarfile.is_tarfile(src):
+            with tarfile.open(src, "r:*") as archive:
+                for info in archive:
+                    if info.isdir():
+                        yield info.name, 0, info.mtime, None
+                    elif info.isfile():
+                        with archive.extractfile(info) as stream:
+                            yield info.name, info.size, info.mtime, stream
+        elif src.lower().endswith(".gz"):
+            # Fichier gzip simple : un seul membre, taille inconnue d'avance
+            name = os.path.splitext(os.path.basename(src))[0]
+            with gzip.open(src, "rb") as stream:
+                yield name, None, os.path.getmtime(src), stream
+        else:
+            raise ValueError("archive illisible ou format non géré")
+
+    def convert(self, src, out, out_fmt):
+        if out_fmt == "zip":
+            with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+                for name, size, mtime, stream in self.members(src):
+                    info = zipfile.ZipInfo(name.rstrip("/") + ("/" if stream is None else ""),
+                                           date_time=zip_date(mtime))
+                    if stream is None:
+                        target.writestr(info, b"")
+                        continue
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with target.open(info, "w", force_zip64=size is None or size > 2 ** 31) as dest:
+                        shutil.copyfileobj(stream, dest, self.CHUNK)
+            return
+        mode = "w:gz" if out_fmt == "gz" else "w"
+        with tarfile.open(out, mode) as target:
+            for name, size, mtime, stream in self.members(src):
+                info = tarfile.TarInfo(name.rstrip("/"))
+                info.mtime = int(mtime)
+                if stream is None:
+                    info.type = tarfile.DIRTYPE
+                    target.addfile(info)
+                    continue
+                if size is None:
+                    # tar exige la taille en en-tête : le membre gzip est mesuré d'abord
+                    size = sum(len(block) for block in iter(lambda: stream.read(self.CHUNK), b""))
+                    stream.seek(0)
+                info.size = size
+                target.addfile(info, stream)
+
+register("image", "image", PillowConverter())
+register("image", "doc", PillowConverter())
+register("doc", "doc", PdfTextConverter())
+register("doc", "doc", OfficeConverter())
+register("archive", "archive", ArchiveConverter())
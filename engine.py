@@ -0,0 +1,1093 @@
+import os
+import threading
+import subprocess
+import re
+import time
+import queue
+import collections
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from probe import MediaProbe, probe_for
+from journal import JobJournal, temp_output
+from planner import plan_conversion, PLAN_LABELS, CONTAINER_CODECS
+from archive import DownloadIndex, clean_url, media_key, info_key, info_path
+from session import YDLSession, BandwidthBudget
+from scanner import scan, mirror_path, FolderWatcher
+from metrics import metrics
+from tools import is_executable, capabilities, encoders_for
+from profiles import (DEFAULT_PROFILE, TWO_PASS_CODECS, AUDIO_TARGETS, DEFAULT_AUDIO_FORMAT, get_profile,
+                      video_args, audio_args, conversion_args, audio_target_args)
+
+# ----- DOWNLOAD SCHEDULER -----
+class DownloadScheduler:
+    # Lance plusieurs URLs en parallèle, avec une limite par hôte
+    def __init__(self, max_workers=4, per_host=2):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.progress = {}
+        self.waits = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    def report(self, idx, fraction):
+        with self._cond:
+            self.progress[idx] = min(max(fraction, 0.0), 1.0)
+            return sum(self.progress.values()) / len(self.progress)
+
+    def run(self, urls, job):
+        # urls peut être un générateur : les éléments sont lancés au fur et à mesure de leur découverte
+        pending = []
+        active = {}
+        results = {}
+        producing = [True]
+        queued = {}
+        self.error = None
+        with self._cond:
+            self.progress = {}
+            self.waits = {}
+
+        def produce():
+            try:
+                for idx, url in enumerate(urls, start=1):
+                    with self._cond:
+                        pending.append((idx, url))
+                        queued[idx] = time.monotonic()
+                        self.progress[idx] = 0.0
+                        self._cond.notify_all()
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._cond:
+                    producing[0] = False
+                    self._cond.notify_all()
+
+        def take():
+            for i, (idx, url) in enumerate(pending):
+                if active.get(self.host_of(url), 0) < self.per_host:
+                    return pending.pop(i)
+            return None
+
+        def worker():
+            while True:
+                with self._cond:
+                    item = None
+                    while pending or producing[0]:
+                        item = take()
+                        if item is not None:
+                            break
+                        self._cond.wait()
+                    if item is None:
+                        return
+                    idx, url = item
+                    self.waits[idx] = time.monotonic() - queued[idx]
+                    host = self.host_of(url)
+                    active[host] = active.get(host, 0) + 1
+                try:
+                    results[idx] = job(idx, url)
+                except Exception as e:
+                    results[idx] = e
+                finally:
+                    with self._cond:
+                        active[host] -= 1
+                        self.progress[idx] = 1.0
+                        self._cond.notify_all()
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.max_workers)]
+        for t in threads:
+            t.start()
+        producer.join()
+        for t in threads:
+            t.join()
+        return [results.get(idx) for idx in sorted(self.progress)]
+
+# ----- FFMPEG PROGRESS -----
+class FFmpegProgress:
+    # Lit la sortie de `ffmpeg -progress pipe:1` (lignes clé=valeur)
+    def __init__(self, duration=None, log_interval=2.0):
+        self.duration = duration
+        self.log_interval = log_interval
+        self.values = {}
+        self.out_time = 0.0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.total_size = 0
+        self.fraction = 0.0
+        self.eta = None
+        self.finished = False
+        self._started = time.monotonic()
+        self._last_log = 0.0
+
+    @staticmethod
+    def _number(value, default=0.0):
+        try:
+            return float(str(value).rstrip("x"))
+        except (TypeError, ValueError):
+            return default
+
+    def feed(self, line):
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return False
+        self.values[key] = value.strip()
+        if key != "progress":
+            return False
+        self._update()
+        return True
+
+    def _update(self):
+        # out_time_ms est aussi en microsecondes dans ffmpeg
+        out_us = self.values.get("out_time_us", self.values.get("out_time_ms"))
+        self.out_time = max(self._number(out_us) / 1_000_000, 0.0)
+        self.fps = self._number(self.values.get("fps"))
+        self.speed = self._number(self.values.get("speed"))
+        self.total_size = int(self._number(self.values.get("total_size")))
+        self.finished = self.values.get("progress") == "end"
+        if self.finished:
+            self.fraction = 1.0
+        elif self.duration:
+            self.fraction = min(self.out_time / self.duration, 1.0)
+        if self.finished:
+            self.eta = 0
+        elif self.duration and self.speed > 0:
+            self.eta = max(self.duration - self.out_time, 0) / self.speed
+        elif self.fraction > 0:
+            elapsed = time.monotonic() - self._started
+            self.eta = elapsed * (1 - self.fraction) / self.fraction
+        else:
+            self.eta = None
+
+    def should_log(self):
+        now = time.monotonic()
+        if self.finished or now - self._last_log >= self.log_interval:
+            self._last_log = now
+            return True
+        return False
+
+    def summary(self):
+        parts = [f"⏳ {int(self.fraction * 100)}%" if self.duration else f"⏳ {self.out_time:.0f}s"]
+        if self.fps:
+            parts.append(f"{self.fps:.0f} fps")
+        if self.speed:
+            parts.append(f"x{self.speed:.2f}")
+        if self.total_size:
+            parts.append(f"{self.total_size / (1024 * 1024):.1f} Mo")
+        if self.eta is not None:
+            parts.append(f"ETA {format_eta(self.eta)}")
+        return " | ".join(parts)
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+def run_ffmpeg(cmd, duration=None, on_progress=None):
+    # cmd doit contenir "-progress pipe:1" ; stderr est vidé en parallèle
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    tail = collections.deque(maxlen=10)
+
+    def drain():
+        for line in proc.stderr:
+            if line.strip():
+                tail.append(line.strip())
+
+    start = time.perf_counter()
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    progress = FFmpegProgress(duration)
+    for line in proc.stdout:
+        if progress.feed(line) and on_progress:
+            on_progress(progress)
+    proc.wait()
+    reader.join()
+    metrics.ffmpeg_done(progress, time.perf_counter() - start)
+    return proc.returncode, list(tail)
+
+def progress_args():
+    return ["-progress", "pipe:1", "-nostats"]
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+# ----- FFMPEG JOB POOL -----
+class FFmpegJob:
+    def __init__(self, src, out, cmd, weight=1, duration=None, tmp=None):
+        self.src = src
+        self.out = out
+        self.cmd = cmd
+        self.tmp = tmp  # si défini, ffmpeg écrit ici puis on renomme vers out
+        self.weight = max(weight, 1)
+        self.duration = duration
+        self.fraction = 0.0
+        self.state = "pending"  # pending / running / done / failed
+        self.returncode = None
+        self.error = ""
+        self.queued = time.monotonic()
+
+class FFmpegJobPool:
+    # Exécute K processus ffmpeg en même temps, K = cœurs / threads par job
+    def __init__(self, threads_per_job=2, workers=None):
+        self.threads_per_job = max(1, int(threads_per_job))
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads_per_job)
+        self.jobs = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        job.cmd = job.cmd[:-1] + ["-threads", str(self.threads_per_job), job.cmd[-1]]
+        self.jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def counts(self):
+        with self._lock:
+            counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self.jobs:
+                counts[job.state] += 1
+            return counts
+
+    def progress(self):
+        with self._lock:
+            total = sum(job.weight for job in self.jobs)
+            finished = sum(job.weight for job in self.jobs if job.state in ("done", "failed"))
+            running = sum(job.weight * job.fraction for job in self.jobs if job.state == "running")
+            return (finished + running) / total if total else 0
+
+    def run_job(self, job, on_progress=None):
+        def update(progress):
+            job.fraction = progress.fraction
+            if on_progress:
+                on_progress(job, progress)
+
+        returncode, tail = run_ffmpeg(job.cmd, job.duration, update)
+        if job.tmp:
+            if returncode == 0:
+                os.replace(job.tmp, job.out)
+            elif os.path.isfile(job.tmp):
+                os.remove(job.tmp)
+        return returncode, tail[-1] if tail else ""
+
+    def run(self, on_start=None, on_done=None, on_progress=None):
+        def worker():
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                with self._lock:
+                    job.state = "running"
+                if on_start:
+                    on_start(job)
+                with metrics.stage("convert", job.src, queue_wait=round(time.monotonic() - job.queued, 4),
+                                   bytes_in=file_size(job.src)) as record:
+                    try:
+                        job.returncode, job.error = self.run_job(job, on_progress)
+                    except Exception as e:
+                        job.returncode, job.error = -1, str(e)
+                    record["ok"] = job.returncode == 0
+                    record["bytes_out"] = file_size(job.out) if record["ok"] else 0
+                with self._lock:
+                    job.state = "done" if job.returncode == 0 else "failed"
+                if on_done:
+                    on_done(job)
+
+        threads = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(min(self.workers, len(self.jobs)) or 1)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.jobs
+
+# ----- TARGET SIZE ENCODER -----
+class TargetSizeEncoder:
+    # Encodage à taille cible : budget audio, 2 passes, vérification de la taille finale
+    CONTAINER_OVERHEAD = 0.02
+    TOLERANCE = 0.05  # on accepte jusqu'à 5 % sous la cible, jamais au-dessus
+    MAX_CORRECTIONS = 2
+    OVERSIZE = 1  # code renvoyé si le fichier reste au-dessus de la cible après les corrections
+
+    def __init__(self, ffmpeg_path, log=print, progress=None, profile=DEFAULT_PROFILE):
+        self.ffmpeg_path = ffmpeg_path
+        self.log = log
+        self.progress = progress or (lambda value: None)
+        # Profil adapté aux encodeurs réellement présents dans ce ffmpeg
+        self.profile = get_profile(profile, encoders_for(ffmpeg_path))
+
+    @staticmethod
+    def audio_bitrate(size_bytes, duration):
+        total_bps = size_bytes * 8 / duration
+        for bps in (128000, 96000, 64000):
+            if bps <= total_bps * 0.2:
+                return bps
+        return 32000
+
+    def video_bitrate(self, size_bytes, duration, audio_bps):
+        usable_bits = size_bytes * 8 * (1 - self.CONTAINER_OVERHEAD) - audio_bps * duration
+        return max(int(usable_bits / duration), 50000)
+
+    def passlog_prefix(self, input_file):
+        # Stats de la passe 1 gardées pour les ré-encodages correctifs, supprimées à la fin d'encode()
+        st = os.stat(input_file)
+        key = (f"{os.path.abspath(input_file)}|{st.st_size}|{st.st_mtime_ns}|"
+               f"{self.profile['codec']}|{self.profile['preset']}")
+        folder = os.path.join(tempfile.gettempdir(), "videotool-passlog")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+    def remove_passlog(self, input_file):
+        # Le .mbtree pèse ~16 Ko par image en 1080p : plusieurs Go pour une source de 3 h
+        try:
+            prefix = self.passlog_prefix(input_file)
+        except OSError:
+            return
+        for suffix in ("-0.log", "-0.log.temp", "-0.log.mbtree", "-0.log.mbtree.temp"):
+            if os.path.isfile(prefix + suffix):
+                os.remove(prefix + suffix)
+
+    def has_audio(self, input_file):
+        # Sonde en cache ; en cas de doute, on réserve le budget audio
+        data = probe_for(self.ffmpeg_path).probe(input_file)
+        if not data:
+            return True
+        return any(stream.get("codec_type") == "audio" for stream in data.get("streams", []))
+
+    def _run(self, cmd, duration, start, span):
+        def on_progress(progress):
+            self.progress(start + progress.fraction * span)
+            if progress.should_log():
+                self.log(progress.summary())
+
+        returncode, tail = run_ffmpeg(cmd, duration, on_progress)
+        if returncode != 0:
+            for line in tail:
+                self.log(line)
+        return returncode
+
+    def _base(self, input_file):
+        return [self.ffmpeg_path, "-y", *progress_args(), "-i", input_file, *video_args(self.profile)]
+
+    def encode_crf(self, input_file, output_file, duration, crf, video_bps=None, audio_bps=None):
+        cmd = self._base(input_file) + ["-crf", str(crf)]
+        if video_bps:
+            cmd += ["-maxrate", str(video_bps), "-bufsize", str(video_bps * 2)]
+        cmd += [*audio_args(self.profile, audio_bps), output_file]
+        return self._run(cmd, duration, 0, 1)
+
+    def encode_single_pass(self, input_file, output_file, duration, video_bps, audio_bps):
+        cmd = self._base(input_file) + ["-b:v", str(video_bps), "-maxrate", str(int(video_bps * 1.5)),
+                                        "-bufsize", str(video_bps * 2), *audio_args(self.profile, audio_bps),
+                                        output_file]
+        return self._run(cmd, duration, 0, 1)
+
+    def encode_two_pass(self, input_file, output_file, duration, video_bps, audio_bps):
+        if self.profile["codec"] not in TWO_PASS_CODECS:
+            # Pas de 2 passes pour ce codec : débit moyen, la vérification de taille corrige l'écart
+            return self.encode_single_pass(input_file, output_file, duration, video_bps, audio_bps)
+        prefix = self.passlog_prefix(input_file)
+        span = 1
+        if not os.path.isfile(prefix + "-0.log"):
+            self.log("Passe 1/2...")
+            cmd = self._base(input_file) + ["-b:v", str(video_bps), "-pass", "1", "-passlogfile", prefix,
+                                            "-an", "-f", "null", os.devnull]
+            returncode = self._run(cmd, duration, 0, 0.5)
+            if returncode != 0:
+                self.remove_passlog(input_file)
+                return returncode
+            span = 0.5
+        else:
+            self.log("Passe 1 déjà en cache, réutilisée.")
+        self.log("Passe 2/2...")
+        cmd = self._base(input_file) + ["-b:v", str(video_bps), "-pass", "2", "-passlogfile", prefix,
+                                        *audio_args(self.profile, audio_bps), output_file]
+        return self._run(cmd, duration, 1 - span, span)
+
+    # Bornes du facteur de correction du débit vidéo entre deux essais
+    MIN_CORRECTION = 0.5
+    MAX_CORRECTION = 2.0
+
+    def encode(self, input_file, output_file, size_bytes, duration):
+        try:
+            return self.encode_to_size(input_file, output_file, size_bytes, duration)
+        finally:
+            self.remove_passlog(input_file)
+
+    def encode_to_size(self, input_file, output_file, size_bytes, duration):
+        self.log(f"Profil : {self.profile['codec']} {self.profile['preset']}")
+        if size_bytes == 0:
+            self.log(f"Mode qualité CRF {self.profile['max_crf']}")
+            return self.encode_crf(input_file, output_file, duration, self.profile["max_crf"])
+
+        audio_bps = self.audio_bitrate(size_bytes, duration)
+        # Source sans piste audio : tout le budget va à la vidéo
+        audio_budget = audio_bps if self.has_audio(input_file) else 0
+        video_bps = self.video_bitrate(size_bytes, duration, audio_budget)
+        if audio_budget:
+            self.log(f"Débit cible: vidéo {video_bps // 1000}k + audio {audio_bps // 1000}k")
+        else:
+            self.log(f"Débit cible: vidéo {video_bps // 1000}k (source sans audio)")
+
+        source_bps = os.path.getsize(input_file) * 8 / duration
+        capped = source_bps <= size_bytes * 8 / duration
+        for attempt in range(self.MAX_CORRECTIONS + 1):
+            if capped:
+                self.log(f"Source déjà sous la cible : CRF {self.profile['crf']} plafonné à {video_bps // 1000}k")
+                returncode = self.encode_crf(input_file, output_file, duration, self.profile["crf"],
+                                             video_bps, audio_bps)
+            else:
+                returncode = self.encode_two_pass(input_file, output_file, duration, video_bps, audio_bps)
+            if returncode != 0:
+                return returncode
+
+            actual = os.path.getsize(output_file)
+            self.log(f"Taille obtenue : {actual / (1024 * 1024):.2f} Mo / {size_bytes / (1024 * 1024):.0f} Mo")
+            in_range = actual <= size_bytes and (capped or actual >= size_bytes * (1 - self.TOLERANCE))
+            if in_range:
+                return 0
+            if attempt == self.MAX_CORRECTIONS:
+                if actual > size_bytes:
+                    self.log("❌ Taille au-dessus de la cible après les ré-encodages correctifs.")
+                    return self.OVERSIZE
+                # Sous la cible hors tolérance : fichier utilisable, simple avertissement
+                self.log("⚠️ Taille hors tolérance après les ré-encodages correctifs.")
+                return 0
+            # Le débit vidéo est corrigé au prorata de l'écart, la passe 1 est réutilisée
+            audio_bytes = audio_budget * duration / 8
+            wanted = size_bytes * (1 - self.TOLERANCE / 2) - audio_bytes
+            got = max(actual - audio_bytes, 1)
+            ratio = min(max(wanted / got, self.MIN_CORRECTION), self.MAX_CORRECTION)
+            video_bps = max(int(video_bps * ratio), 50000)
+            capped = False
+            self.log(f"🔁 Ré-encodage correctif à {video_bps // 1000}k")
+        return 0
+
+
+# ----- FORMATS -----
+FORMAT_MAP = {
+    'video': ['mp4','mkv','avi','mov','webm','flv'],
+    'audio': ['mp3','aac','wav','flac','ogg','m4a','opus'],
+    'image': ['jpg','jpeg','png','gif','bmp','webp'],
+    'doc':   ['pdf','docx','txt','xlsx','pptx'],
+    'archive': ['zip','tar','gz','rar','7z']
+}
+
+def detect_types(exts):
+    types = set()
+    for e in exts:
+        for fmts in FORMAT_MAP.values():
+            if e.lstrip('.') in fmts:
+                types |= set(fmts)
+                break
+    return sorted(types) if types else ['mp4','mp3','png','pdf']
+
+def extensions(*kinds):
+    return tuple('.'+ext for kind in kinds for ext in FORMAT_MAP[kind])
+
+def ffmpeg_ready(ffmpeg_path):
+    return is_executable(ffmpeg_path)
+
+def get_video_duration(ffmpeg_path, file):
+    if not ffmpeg_ready(ffmpeg_path):
+        return None
+    return probe_for(ffmpeg_path).duration(file)
+
+def conversion_plan(data, out_fmt, profile=DEFAULT_PROFILE, encoders=None):
+    # Remux si possible, sinon transcodage avec les réglages du profil
+    mode, args = plan_conversion(data, out_fmt)
+    if mode == "transcode":
+        if out_fmt in AUDIO_TARGETS and out_fmt != DEFAULT_AUDIO_FORMAT:
+            # Cible audio : encodeur et qualité propres au format, indépendants du profil vidéo
+            args = audio_target_args(out_fmt)
+        elif out_fmt in CONTAINER_CODECS:
+            args = conversion_args(profile, *CONTAINER_CODECS[out_fmt], encoders)
+    return mode, args
+
+def is_audio_format(out_fmt):
+    return out_fmt in AUDIO_TARGETS
+
+def backoff(attempt, base=2.0, cap=60.0):
+    # Attente exponentielle entre deux essais : 2 s, 4 s, 8 s... plafonnée
+    return min(cap, base * 2 ** attempt)
+
+# Erreurs définitives : inutile de réessayer
+NO_DURATION = "Impossible d'obtenir la durée vidéo"
+PERMANENT_ERRORS = ("Unsupported URL", "Video unavailable", "Private video", "HTTP Error 404", NO_DURATION)
+
+# ----- ENGINES -----
+# Aucune dépendance à Tk : utilisés par l'interface (main.py) et par la CLI (videotool.py)
+class DownloadEngine:
+    def __init__(self, ffmpeg_path, cookie_file="cookieyt.txt", workers=4, per_host=2, log=print, progress=None,
+                 index=None, skip_done=True, session=None, rate_limit=None, fragments=4, retries=3,
+                 audio_format=DEFAULT_AUDIO_FORMAT, previews=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.cookie_file = cookie_file
+        self.scheduler = DownloadScheduler(max_workers=workers, per_host=per_host)
+        self.log = log
+        self.progress = progress or (lambda value: None)
+        self.index = index if index is not None else DownloadIndex()
+        self.skip_done = skip_done
+        self.session = session or YDLSession(budget=BandwidthBudget(rate_limit) if rate_limit else None)
+        self.fragments = max(1, int(fragments))
+        self.retries = max(0, int(retries))
+        self.audio_format = audio_format if audio_format in AUDIO_TARGETS else DEFAULT_AUDIO_FORMAT
+        # PreviewGenerator optionnel : vignettes + planche après les téléchargements vidéo
+        self.previews = previews
+        # Dernier log de progression par téléchargement (idx -> instant)
+        self._last_log = {}
+
+    @staticmethod
+    def extract_urls(text):
+        urls = [clean_url(url) for url in re.findall(r'(https?://[^\s]+)', text)]
+        return list(dict.fromkeys(url for url in urls if url))
+
+    def variant(self, res="best", typ="video"):
+        if typ != "audio":
+            return f"{typ}-{res}"
+        # "audio" seul = ancien mode mp3 : les index existants restent valables
+        return "audio" if self.audio_format == "mp3" else f"audio-{self.audio_format}"
+
+    def filter_urls(self, urls, variant):
+        # Doublons du lot (même extracteur + id) puis éléments déjà téléchargés
+        keyed = {}
+        for url in urls:
+            keyed.setdefault(media_key(url), url)
+        if len(keyed) < len(urls):
+            self.log(f"🔁 {len(urls) - len(keyed)} doublon(s) ignoré(s).")
+        if self.skip_done:
+            done = self.index.completed(keyed, variant)
+            if done:
+                self.log(f"⏭️ {len(done)} élément(s) déjà téléchargé(s), ignoré(s).")
+            keyed = {key: url for key, url in keyed.items() if key not in done}
+        return keyed
+
+    def stream_urls(self, urls, variant, items=None, limit=None):
+        # Mode playlist : les entrées sont filtrées et transmises au planificateur dès leur découverte
+        from playlist import expand
+
+        seen = set()
+        duplicates = skipped = 0
+        opts = {
+            "quiet": True,
+            "no_warnings": True,
+            "extract_flat": "in_playlist",
+            "lazy_playlist": True,
+            "cookiefile": self.cookie_file if os.path.isfile(self.cookie_file) else None,
+        }
+        with self.session.client(opts) as ydl:
+            for url in urls:
+                self.log(f"📃 Lecture de la playlist : {url}")
+                try:
+                    for entry_url in expand(ydl, url, items, limit, self.session):
+                        key = media_key(entry_url)
+                        if key in seen:
+                            duplicates += 1
+                            continue
+                        seen.add(key)
+                        if self.skip_done and self.index.completed([key], variant):
+                            skipped += 1
+                            continue
+                        yield entry_url
+                except Exception as e:
+                    self.log(f"❌ Playlist illisible : {e}")
+        if duplicates:
+            self.log(f"🔁 {duplicates} doublon(s) ignoré(s).")
+        if skipped:
+            self.log(f"⏭️ {skipped} élément(s) déjà téléchargé(s), ignoré(s).")
+
+    def is_ffmpeg_available(self):
+        # Capacités en cache disque : aucun processus lancé tant que le binaire ne change pas
+        return capabilities(self.ffmpeg_path) is not None
+
+    def build_options(self, dest, res="best", typ="video"):
+        ydl_opts = {
+            "outtmpl": os.path.join(dest, "%(title)s.%(ext)s"),
+            "noplaylist": True,
+            "quiet": True,
+            "no_warnings": True,
+            # Barre [download] de yt-dlp désactivée : la progression passe par hook()
+            "noprogress": True,
+            "cookiefile": self.cookie_file if os.path.isfile(self.cookie_file) else None,
+            "format": "bestvideo+bestaudio/best",
+            "merge_output_format": "mp4",
+            "ffmpeg_location": self.ffmpeg_path,
+            # Reprise des fichiers .part, nouvelles tentatives internes et fragments DASH/HLS en parallèle
+            "continuedl": True,
+            "retries": 10,
+            "fragment_retries": 10,
+            "retry_sleep_functions": {"http": backoff, "fragment": backoff},
+            "concurrent_fragment_downloads": self.fragments,
+        }
+
+        if typ == "audio":
+            # Flux déjà dans le codec voulu privilégié : FFmpegExtractAudio le garde alors sans ré-encodage
+            target = AUDIO_TARGETS[self.audio_format]
+            preferred = f"bestaudio[acodec^={target['acodec']}]/" if target["acodec"] else ""
+            ydl_opts["format"] = preferred + "bestaudio/best"
+            extract = {"key": "FFmpegExtractAudio", "preferredcodec": self.audio_format}
+            if target["ydl_quality"]:
+                extract["preferredquality"] = target["ydl_quality"]
+            ydl_opts["postprocessors"] = [extract]
+        elif typ == "video":
+            if res == "best":
+                ydl_opts["format"] = "bestvideo+bestaudio/best"
+            else:
+                height = int(res.replace("p", ""))
+                ydl_opts["format"] = f"bestvideo[height<={height}]+bestaudio/best"
+            ydl_opts["merge_output_format"] = "mp4"
+        else:  # both
+            ydl_opts["format"] = "bestvideo+bestaudio/best"
+            ydl_opts["merge_output_format"] = "mp4"
+        return ydl_opts
+
+    def download(self, urls, dest, res="best", typ="video", playlist=False, items=None, limit=None,
+                 out_fmt=None, size_mb=None, profile=DEFAULT_PROFILE):
+        # out_fmt : mode flux, le média est transcodé pendant le téléchargement (size_mb = taille cible)
+        self.progress(0)
+        if not urls:
+            self.log("⚠️ Aucune URL valide détectée.")
+            return False
+
+        if not os.path.isdir(dest):
+            self.log("⚠️ Le dossier de destination est invalide.")
+            return False
+
+        if not self.is_ffmpeg_available():
+            self.log("❌ FFmpeg est requis pour fusionner l'audio et la vidéo, mais il est introuvable.")
+            self.log("👉 Installez-le depuis https://ffmpeg.org/download.html ou ajoutez-le au PATH.")
+            return False
+
+        variant = self.variant(res, typ)
+        pipeline = None
+        if out_fmt:
+            # Import tardif : seulement utile en mode flux
+            from pipeline import StreamPipeline
+            pipeline = StreamPipeline(self, profile)
+            variant += f"-{out_fmt}-" + (f"{size_mb}mb" if size_mb is not None else profile)
+        if playlist:
+            source = self.stream_urls(urls, variant, items, limit)
+            total = None
+        else:
+            keyed = self.filter_urls(urls, variant)
+            if not keyed:
+                self.log("✅ Rien à télécharger.")
+                return True
+            source = list(keyed.values())
+            total = len(source)
+
+        ydl_opts = self.build_options(dest, res, typ)
+        outputs = []
+
+        def job(idx, url):
+            tag = f"[{idx}/{total}]" if total else f"[{idx}]"
+            self.log(f"⬇️ {tag} Début téléchargement : {url}")
+            with metrics.stage("stream" if pipeline else "download", url,
+                               queue_wait=round(self.scheduler.waits.get(idx, 0), 4)) as record:
+                for attempt in range(self.retries + 1):
+                    record["retries"] = attempt
+                    try:
+                        if pipeline:
+                            info, out = pipeline.run(url, dest, ydl_opts, out_fmt, size_mb, self.log,
+                                                     lambda value: self.progress(self.scheduler.report(idx, value)))
+                        else:
+                            info = self.session.download(ydl_opts, url, lambda d: self.hook(d, idx, tag))
+                            out = info_path(info)
+                        self.index.add([media_key(url), info_key(info)], variant, url, out)
+                        record["bytes_out"] = file_size(out)
+                        if out:
+                            outputs.append(out)
+                        self.log(f"✅ {tag} Téléchargement terminé.")
+                        return True
+                    except Exception as e:
+                        if attempt == self.retries or any(marker in str(e) for marker in PERMANENT_ERRORS):
+                            record.update(ok=False, error=str(e))
+                            self.log(f"❌ {tag} Erreur: {e}")
+                            return False
+                        delay = backoff(attempt)
+                        self.log(f"🔄 {tag} Erreur ({e}), reprise dans {delay:.0f} s...")
+                        time.sleep(delay)
+
+        results = self.scheduler.run(source, job)
+        self.progress(0)
+        # Liste d'URLs interrompue (expansion de playlist...) : lot incomplet, signalé comme un échec
+        error = self.scheduler.error
+        if error is not None:
+            self.log(f"❌ Lecture des URLs interrompue : {error}")
+        elif playlist and not results:
+            self.log("✅ Rien à télécharger.")
+        if self.previews and typ != "audio" and outputs:
+            self.log(f"🖼️ Génération des aperçus ({len(outputs)} fichier(s))...")
+            self.previews.generate_many(outputs)
+        return error is None and all(result is True for result in results)
+
+    def close(self):
+        self.session.close()
+
+    # Même cadence que les logs de progression ffmpeg ; la barre reste mise à jour à chaque appel
+    LOG_INTERVAL = 2.0
+
+    def hook(self, d, idx=1, tag="[1/1]"):
+        if d['status'] == 'downloading':
+            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+            downloaded = d.get('downloaded_bytes', 0)
+            if total_bytes and total_bytes > 0:
+                progress = downloaded / total_bytes
+                self.progress(self.scheduler.report(idx, progress))
+                now = time.monotonic()
+                if now - self._last_log.get(idx, 0.0) >= self.LOG_INTERVAL:
+                    self._last_log[idx] = now
+                    self.log(f"{tag} Téléchargement : {int(progress*100)}%")
+        elif d['status'] == 'finished':
+            self.progress(self.scheduler.report(idx, 1))
+            self.log(f"{tag} Téléchargement terminé.")
+
+class CompressionEngine:
+    def __init__(self, ffmpeg_path, log=print, progress=None, profile=DEFAULT_PROFILE, segmented=False,
+                 runners=None, previews=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.profile = profile
+        self.segmented = segmented
+        self.runners = runners
+        self.previews = previews
+        self.log = log
+        self.progress = progress or (lambda value: None)
+
+    def compress(self, input_file, dest_folder, size_mb=0):
+        self.progress(0)
+        if not os.path.isfile(input_file):
+            self.log("⚠️ Fichier vidéo invalide.")
+            return False
+
+        if not os.path.isdir(dest_folder):
+            self.log("⚠️ Dossier destination invalide.")
+            return False
+
+        size_bytes = int(size_mb) * 1024 * 1024
+
+        base = os.path.basename(input_file)
+        name, ext = os.path.splitext(base)
+        output_file = os.path.join(dest_folder, f"{name}_compressed.mp4")
+
+        if not ffmpeg_ready(self.ffmpeg_path):
+            self.log("⚠️ ffmpeg non configuré ou introuvable.")
+            return False
+
+        duration = get_video_duration(self.ffmpeg_path, input_file)
+        if duration is None or duration == 0:
+            self.log("⚠️ Impossible d'obtenir la durée vidéo.")
+            return False
+
+        self.log(f"Durée vidéo: {duration:.2f}s")
+        self.log("Lancement compression...")
+        if self.segmented:
+            # Import tardif : segments.py dépend lui-même de ce module
+            from segments import SegmentedEncoder
+            encoder = SegmentedEncoder(self.ffmpeg_path, log=self.log, progress=self.progress,
+                                       profile=self.profile, runners=self.runners)
+        else:
+            encoder = TargetSizeEncoder(self.ffmpeg_path, log=self.log, progress=self.progress,
+                                        profile=self.profile)
+
+        done = False
+        with metrics.stage("encode", input_file, bytes_in=file_size(input_file),
+                           profile=self.profile, segmented=self.segmented) as record:
+            try:
+                returncode = encoder.encode(input_file, output_file, size_bytes, duration)
+                if returncode == 0:
+                    record["bytes_out"] = file_size(output_file)
+                    self.log(f"✅ Compression terminée : {output_file}")
+                    self.progress(1)
+                    done = True
+                else:
+                    record.update(ok=False, error=f"code {returncode}")
+                    self.log(f"❌ Erreur lors de la compression, code {returncode}")
+            except Exception as e:
+                record.update(ok=False, error=str(e))
+                self.log(f"Erreur compression : {e}")
+        if done:
+            # Étape aperçus hors de la mesure d'encodage
+            if self.previews:
+                self.previews.generate(output_file)
+            return True
+        self.progress(0)
+        return False
+
+class ConversionEngine:
+    def __init__(self, ffmpeg_path, threads_per_job=2, workers=None, log=print, progress=None, journal=None,
+                 profile=DEFAULT_PROFILE):
+        self.ffmpeg_path = ffmpeg_path
+        self.profile = profile
+        self.threads_per_job = threads_per_job
+        self.workers = workers
+        self.journal = journal if journal is not None else JobJournal()
+        self.log = log
+        self.progress = progress or (lambda value: None)
+
+    def convert_file(self, inp, out_fmt, dst):
+        self.progress(0)
+        if not os.path.isfile(inp):
+            self.log("⚠️ Fichier invalide.")
+            return False
+        if not out_fmt:
+            self.log("⚠️ Choisissez un format.")
+            return False
+        if not os.path.isdir(dst):
+            self.log("⚠️ Dossier de destination invalide.")
+            return False
+
+        name,_ = os.path.splitext(os.path.basename(inp))
+        out = os.path.join(dst, f"{name}_converted.{out_fmt}")
+        from converters import converter_for, unsupported
+        converter = converter_for(inp, out_fmt)
+        if converter:
+            self.log(f"🔄 1/1 : {os.path.basename(inp)} → {out_fmt} ({converter.name})")
+            error = self.run_converter(converter, inp, out, out_fmt)
+            if error:
+                self.log(f"❌ Erreur : {error}")
+                return False
+            self.log(f"✅ Terminé : {out}")
+            self.progress(1)
+            return True
+        if unsupported(inp, out_fmt):
+            self.log(f"⚠️ Aucun convertisseur disponible vers {out_fmt} (Pillow, LibreOffice ou pdftotext requis).")
+            return False
+        if not ffmpeg_ready(self.ffmpeg_path):
+            self.log("⚠️ ffmpeg non configuré.")
+            return False
+
+        tmp = temp_output(out)
+        data = probe_for(self.ffmpeg_path).probe(inp)
+        mode, args = conversion_plan(data, out_fmt, self.profile, encoders_for(self.ffmpeg_path))
+        cmd = [self.ffmpeg_path, "-y", *progress_args(), "-i", inp, *args, tmp]
+        self.log(f"🔄 1/1 : {os.path.basename(inp)} → {out_fmt} ({PLAN_LABELS[mode]})")
+        duration = MediaProbe.duration_of(data)
+
+        def on_progress(progress):
+            self.progress(progress.fraction)
+            if progress.should_log():
+                self.log(progress.summary())
+
+        with metrics.stage("convert", inp, mode=mode, bytes_in=file_size(inp)) as record:
+            returncode, tail = run_ffmpeg(cmd, duration, on_progress)
+            record["ok"] = returncode == 0
+            record["bytes_out"] = file_size(tmp) if returncode == 0 else 0
+        if returncode==0:
+            os.replace(tmp, out)
+            self.log(f"✅ Terminé : {out}")
+            self.progress(1)
+            return True
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        for line in tail:
+            self.log(line)
+        self.log(f"❌ Erreur {returncode}")
+        return False
+
+    def check_folder(self, folder, out_fmt, dst):
+        if not os.path.isdir(folder):
+            self.log("⚠️ Dossier invalide.")
+            return False
+        if not out_fmt:
+            self.log("⚠️ Choisissez un format.")
+            return False
+        if not os.path.isdir(dst):
+            self.log("⚠️ Dossier de destination invalide.")
+            return False
+        return True
+
+    def convert_folder(self, folder, out_fmt, dst, recursive=False):
+        # recursive : sous-dossiers inclus, arborescence reproduite sous dst
+        self.progress(0)
+        if not self.check_folder(folder, out_fmt, dst):
+            return False
+        files = [entry.path for entry in scan(folder, extensions(*FORMAT_MAP), recursive, exclude=dst)]
+        if not files:
+            self.log("⚠️ Aucun fichier compatible trouvé.")
+            return False
+        return self.convert_files(files, folder, out_fmt, dst)
+
+    def watch(self, folder, out_fmt, dst, stop=None, interval=2.0, recursive=False):
+        # Conversion du dossier puis des fichiers qui arrivent, jusqu'à stop.set()
+        if not self.check_folder(folder, out_fmt, dst):
+            return False
+        self.convert_folder(folder, out_fmt, dst, recursive=recursive)
+        suffix = f"_converted.{out_fmt}"
+
+        def own_outputs(files):
+            # Sorties écrites dans le dossier surveillé : jamais reconverties
+            return [f for f in files if not f.lower().endswith(suffix)]
+
+        watcher = FolderWatcher(folder, extensions(*FORMAT_MAP),
+                                lambda files: self.convert_files(own_outputs(files), folder, out_fmt, dst),
+                                interval=interval, exclude=dst, log=self.log, recursive=recursive)
+        watcher.run(stop)
+        self.log("⏹️ Surveillance arrêtée.")
+        return True
+
+    def convert_files(self, files, root, out_fmt, dst):
+        if not files:
+            return True
+        self.progress(0)
+        # Import tardif : converters importe engine
+        from converters import converter_for, unsupported
+
+        # Images, documents et archives : backends dédiés ; le reste passe par ffmpeg
+        groups = collections.defaultdict(list)
+        media = []
+        impossible = 0
+        for f in files:
+            converter = converter_for(f, out_fmt)
+            if converter:
+                groups[converter].append(f)
+            elif unsupported(f, out_fmt):
+                impossible += 1
+            else:
+                media.append(f)
+        if impossible:
+            self.log(f"⚠️ {impossible} fichier(s) sans convertisseur disponible vers {out_fmt}, ignorés "
+                     "(Pillow, LibreOffice ou pdftotext requis).")
+        ok = True
+        if media and not ffmpeg_ready(self.ffmpeg_path):
+            self.log("⚠️ ffmpeg non configuré.")
+            media, ok = [], False
+        share = sum(len(group) for group in groups.values()) / max(1, len(files) - impossible)
+        ok = self.convert_with_backends(groups, root, out_fmt, dst, 0, share) and ok
+        if media:
+            ok = self.convert_media(media, root, out_fmt, dst, share, 1 - share) and ok
+        self.progress(1)
+        self.log("🎉 Tout est terminé !")
+        return ok
+
+    def run_converter(self, converter, src, out, out_fmt):
+        # Même écriture atomique que ffmpeg : fichier .part puis renommage ; None = succès
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        tmp = temp_output(out)
+        with metrics.stage("convert", src, backend=converter.name, bytes_in=file_size(src)) as record:
+            try:
+                converter.convert(src, tmp, out_fmt)
+                os.replace(tmp, out)
+                record["bytes_out"] = file_size(out)
+                return None
+            except Exception as e:
+                if os.path.isfile(tmp):
+                    os.remove(tmp)
+                record.update(ok=False, error=str(e) or type(e).__name__)
+                return record["error"]
+
+    def convert_with_backends(self, groups, root, out_fmt, dst, start=0, span=1):
+        jobs = []
+        skipped = 0
+        for converter, files in groups.items():
+            params = {"format": out_fmt, "backend": converter.name}
+            for f in files:
+                out = mirror_path(f, root, dst, f"_converted.{out_fmt}")
+                if self.journal.is_done(f, out, params):
+                    skipped += 1
+                else:
+                    jobs.append((converter, f, out, params))
+        if skipped:
+            self.log(f"⏭️ {skipped} fichier(s) déjà à jour, ignorés.")
+        if not jobs:
+            return True
+        total = len(jobs)
+        counts = collections.Counter(converter.name for converter, *_ in jobs)
+        self.log(f"🧩 {total} fichier(s) hors ffmpeg : " + " | ".join(f"{n} : {c}" for n, c in counts.items()))
+        finished = collections.Counter()
+        lock = threading.Lock()
+
+        def run(job):
+            converter, src, out, params = job
+            error = self.run_converter(converter, src, out, out_fmt)
+            with lock:
+                finished["failed" if error else "done"] += 1
+                count = sum(finished.values())
+            if error:
+                self.log(f"❌ {count}/{total} : {os.path.basename(src)} ({converter.name}) {error}")
+            else:
+                self.journal.record(src, out, params)
+                self.log(f"✅ {count}/{total} : {os.path.basename(out)}")
+            self.progress(start + span * count / total)
+
+        # Un exécuteur par backend, chacun limité à son propre parallélisme, tous en même temps
+        executors = {converter: ThreadPoolExecutor(max_workers=converter.workers) for converter in groups}
+        try:
+            futures = [executors[job[0]].submit(run, job) for job in jobs]
+            for future in futures:
+                future.result()
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
+        if finished["failed"]:
+            self.log(f"⚠️ {finished['failed']} fichier(s) en erreur sur {total}.")
+        return finished["failed"] == 0
+
+    def convert_media(self, files, root, out_fmt, dst, start=0, span=1):
+        if is_audio_format(out_fmt):
+            # Encodeurs audio mono-thread : un ffmpeg par cœur, beaucoup de petits fichiers à la fois
+            pool = FFmpegJobPool(threads_per_job=1, workers=self.workers)
+        else:
+            pool = FFmpegJobPool(threads_per_job=self.threads_per_job, workers=self.workers)
+        timed = extensions('video', 'audio')
+        probes = probe_for(self.ffmpeg_path).probe_many(f for f in files if f.lower().endswith(timed))
+        encoders = encoders_for(self.ffmpeg_path)
+        plans = {}
+        skipped = 0
+        for f in files:
+            out = mirror_path(f, root, dst, f"_converted.{out_fmt}")
+            mode, args = conversion_plan(probes.get(f), out_fmt, self.profile, encoders)
+            params = {"format": out_fmt, "args": args}
+            if self.journal.is_done(f, out, params):
+                skipped += 1
+                continue
+            plans[f] = (mode, params)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            tmp = temp_output(out)
+            cmd = [self.ffmpeg_path, "-y", *progress_args(), "-i", f, *args, tmp]
+            pool.add(FFmpegJob(f, out, cmd, weight=os.path.getsize(f),
+                               duration=MediaProbe.duration_of(probes.get(f)), tmp=tmp))
+        if skipped:
+            self.log(f"⏭️ {skipped} fichier(s) déjà à jour, ignorés.")
+        total = len(pool.jobs)
+        if not total:
+            return True
+        modes = collections.Counter(mode for mode, _ in plans.values())
+        self.log(f"🔁 {total} fichiers à convertir ({pool.workers} en parallèle)...")
+        self.log(" | ".join(f"{PLAN_LABELS[mode]} : {count}" for mode, count in modes.items()))
+        last_log = [0.0]
+
+        def on_start(job):
+            self.log(f"🔄 {os.path.basename(job.src)} → {out_fmt} ({PLAN_LABELS[plans[job.src][0]]})")
+
+        def on_progress(job, progress):
+            self.progress(start + span * pool.progress())
+            now = time.monotonic()
+            if now - last_log[0] >= 2.0:
+                last_log[0] = now
+                counts = pool.counts()
+                self.log(f"⏳ {int(pool.progress()*100)}% | {counts['running']} en cours | "
+                         f"{counts['done'] + counts['failed']}/{total} terminés")
+
+        def on_done(job):
+            counts = pool.counts()
+            finished = counts["done"] + counts["failed"]
+            if job.state == "done":
+                self.journal.record(job.src, job.out, plans[job.src][1])
+                self.log(f"✅ {finished}/{total} : {os.path.basename(job.out)}")
+            else:
+                self.log(f"❌ {finished}/{total} : Erreur {job.returncode} ({os.path.basename(job.src)}) {job.error}")
+            self.progress(start + span * pool.progress())
+
+        pool.run(on_start, on_done, on_progress)
+        counts = pool.counts()
+        if counts["failed"]:
+            self.log(f"⚠️ {counts['failed']} fichier(s) en erreur sur {total}.")
+        return counts["failed"] == 0
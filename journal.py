@@ -0,0 +1,58 @@
+import os
+import hashlib
+from cache import DiskCache
+
+# ----- CONTENT FINGERPRINT -----
+SAMPLE_SIZE = 64 * 1024
+
+def content_fingerprint(path):
+    # Taille + hash de trois échantillons (début, milieu, fin) : rapide même sur de gros fichiers
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(size // 2 - SAMPLE_SIZE // 2, 0), max(size - SAMPLE_SIZE, 0)}):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+def stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def temp_output(out):
+    # Même extension pour que ffmpeg devine le format ; renommé atomiquement une fois terminé
+    folder, base = os.path.split(out)
+    name, ext = os.path.splitext(base)
+    return os.path.join(folder, f".{name}.part{ext}")
+
+# ----- JOB JOURNAL -----
+class JobJournal:
+    # Une entrée par sortie : empreinte de l'entrée, paramètres d'encodage, état de la sortie
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else DiskCache("journal", max_entries=500000)
+
+    def is_done(self, src, out, params):
+        entry = self.cache.get(os.path.abspath(out))
+        if not entry or entry.get("params") != params or not os.path.isfile(out):
+            return False
+        try:
+            if stat_key(out) != entry.get("output"):
+                return False
+            # Entrée inchangée (taille, mtime) : pas besoin de relire son contenu
+            if stat_key(src) == entry.get("input_stat"):
+                return True
+            return content_fingerprint(src) == entry.get("input")
+        except OSError:
+            return False
+
+    def record(self, src, out, params):
+        try:
+            self.cache.set(os.path.abspath(out), {
+                "src": os.path.abspath(src),
+                "input": content_fingerprint(src),
+                "input_stat": stat_key(src),
+                "output": stat_key(out),
+                "params": params,
+            })
+        except OSError:
+            pass
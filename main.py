@@ -1,36 +1,74 @@
 import os
+import itertools
 import threading
-import subprocess
-import json
-import re
+import queue
+import collections
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from yt_dlp import YoutubeDL
-
-# ----- CONFIG FILE -----
-CONFIG_FILE = "config.json"
-
-def save_config(data):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(data, f)
-
-def load_config():
-    if os.path.isfile(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    else:
-        return {}
+from engine import detect_types, DownloadEngine, CompressionEngine, ConversionEngine
+from profiles import PROFILES, DEFAULT_PROFILE, AUDIO_TARGETS, DEFAULT_AUDIO_FORMAT
+from session import parse_rate
+from scanner import scan
+from metrics import metrics
+from config import store_for, PROFILE_KEYS
+from tools import find_ffmpeg, is_ffmpeg, capabilities
+
+# ----- EVENT BUS -----
+class EventBus:
+    # Les threads de travail publient ici ; la boucle Tk vide la file par lots
+    def __init__(self, max_lines=2000, batch_limit=5000):
+        self.max_lines = max_lines
+        self.batch_limit = batch_limit
+        self._queue = queue.Queue()
+
+    def log(self, channel, msg):
+        self._queue.put(("log", channel, msg))
+
+    def clear(self, channel):
+        self._queue.put(("clear", channel, None))
+
+    def progress(self, channel, value):
+        self._queue.put(("progress", channel, value))
+
+    def finished(self, channel, value=None):
+        # Fin d'une tâche longue (surveillance...) : l'interface est remise en état dans la boucle Tk
+        self._queue.put(("finished", channel, value))
+
+    def drain(self):
+        cleared = set()
+        logs = {}
+        progress = {}
+        finished = []
+        for _ in range(self.batch_limit):
+            try:
+                kind, channel, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "clear":
+                cleared.add(channel)
+                logs[channel] = collections.deque(maxlen=self.max_lines)
+            elif kind == "log":
+                logs.setdefault(channel, collections.deque(maxlen=self.max_lines)).append(value)
+            elif kind == "finished":
+                finished.append((channel, value))
+            else:
+                progress[channel] = value
+        return cleared, logs, progress, finished
 
 # ----------------------------------
 
 class VideoToolApp(ctk.CTk):
+    FRAME_MS = 50  # ~20 rafraîchissements/s pour les logs et barres
+    NO_PROFILE = "(aucun)"  # entrée du menu des profils de job : configuration de base
+
     def __init__(self):
         super().__init__()
         self.title("VideoTool - Downloader, Compressor, Converter")
         self.geometry("700x700")
-        self.config_data = load_config()
-        self.ffmpeg_path = self.config_data.get("ffmpeg_path", "")
+        self.settings = store_for()
+        # Chemin configuré, sinon PATH ou copie fournie avec l'application
+        self.ffmpeg_path = find_ffmpeg(self.settings.get("ffmpeg_path", ""))
         self.cookie_file = "cookieyt.txt" 
         self.notebook = ctk.CTkTabview(self, width=680, height=650)
         self.notebook.pack(padx=10, pady=10, fill="both", expand=True)
@@ -42,13 +80,47 @@ class VideoToolApp(ctk.CTk):
         self.create_compression_tab()
         self.create_conversion_tab()
         self.create_config_tab()
-        self.format_map = {
-            'video': ['mp4','mkv','avi','mov','webm','flv'],
-            'audio': ['mp3','aac','wav','flac','ogg','m4a'],
-            'image': ['jpg','jpeg','png','gif','bmp','webp'],
-            'doc':   ['pdf','docx','txt','xlsx','pptx'],
-            'archive': ['zip','tar','gz','rar','7z']
-        }
+        self.events = EventBus()
+        self.log_widgets = {"download": self.download_log, "comp": self.comp_log, "conv": self.conv_log}
+        self.progress_bars = {"download": self.download_progress, "comp": self.comp_progress,
+                              "conv": self.conv_progress}
+        self.finish_handlers = {"conv": self.watch_finished}
+        self.after(self.FRAME_MS, self.pump_events)
+        # Mesures par job (JSON lines), Prometheus et cProfile : seulement si configurés, comme la CLI
+        metrics.configure(jsonl=self.settings.get("metrics_jsonl"),
+                          prometheus=self.settings.get("metrics_prometheus"),
+                          profile_dir=self.settings.get("profile_dir"))
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        metrics.flush()
+        self.settings.flush()
+        self.destroy()
+
+    def pump_events(self):
+        cleared, logs, progress, finished = self.events.drain()
+        for channel in cleared:
+            widget = self.log_widgets[channel]
+            widget.configure(state="normal")
+            widget.delete("1.0", "end")
+            widget.configure(state="disabled")
+        for channel, lines in logs.items():
+            if not lines:
+                continue
+            widget = self.log_widgets[channel]
+            widget.configure(state="normal")
+            widget.insert("end", "\n".join(lines) + "\n")
+            # Tampon circulaire : on garde les max_lines dernières lignes
+            count = int(widget.index("end-1c").split(".")[0]) - 1
+            if count > self.events.max_lines:
+                widget.delete("1.0", f"{count - self.events.max_lines + 1}.0")
+            widget.see("end")
+            widget.configure(state="disabled")
+        for channel, value in progress.items():
+            self.progress_bars[channel].set(value)
+        for channel, value in finished:
+            self.finish_handlers[channel](value)
+        self.after(self.FRAME_MS, self.pump_events)
 
     # ----------- Onglet Téléchargement -----------
     def create_download_tab(self):
@@ -70,11 +142,47 @@ class VideoToolApp(ctk.CTk):
         self.download_type_menu = ctk.CTkOptionMenu(frame, values=["audio", "video", "both"], variable=self.download_type_var)
         self.download_type_menu.pack()
 
+        ctk.CTkLabel(frame, text="Format audio (best = codec d'origine, sans ré-encodage) :").pack(pady=5)
+        self.download_audio_var = ctk.StringVar(value=self.settings.get("audio_format", DEFAULT_AUDIO_FORMAT))
+        ctk.CTkOptionMenu(frame, values=list(AUDIO_TARGETS), variable=self.download_audio_var).pack()
+
+        ctk.CTkLabel(frame, text="Téléchargements simultanés :").pack(pady=5)
+        self.download_workers_var = ctk.StringVar(value=str(self.settings.get("download_workers", 4)))
+        self.download_workers_menu = ctk.CTkOptionMenu(frame, values=["1", "2", "4", "8", "16"],
+            variable=self.download_workers_var)
+        self.download_workers_menu.pack()
+
+        self.download_skip_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(frame, text="Ignorer les vidéos déjà téléchargées",
+                        variable=self.download_skip_var).pack(pady=5)
+
+        self.download_playlist_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(frame, text="Développer les playlists et chaînes",
+                        variable=self.download_playlist_var).pack(pady=5)
+        ctk.CTkLabel(frame, text="Éléments (ex. 1-10,15,20-) et nombre maximal :").pack(pady=5)
+        playlist_row = ctk.CTkFrame(frame, fg_color="transparent")
+        playlist_row.pack()
+        self.download_items_entry = ctk.CTkEntry(playlist_row, width=160)
+        self.download_items_entry.pack(side="left", padx=5)
+        self.download_limit_entry = ctk.CTkEntry(playlist_row, width=80)
+        self.download_limit_entry.pack(side="left", padx=5)
+
+        self.download_stream_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(frame, text="Compresser pendant le téléchargement (Mo, sans fichier intermédiaire)",
+                        variable=self.download_stream_var).pack(pady=5)
+        self.download_size_entry = ctk.CTkEntry(frame, width=80)
+        self.download_size_entry.insert(0, str(self.settings.get("stream_size_mb", 25)))
+        self.download_size_entry.pack()
+
+        self.download_previews_var = ctk.BooleanVar(value=self.settings.get("download_previews", False))
+        ctk.CTkCheckBox(frame, text="Générer des aperçus (vignettes + planche)",
+                        variable=self.download_previews_var).pack(pady=5)
+
         ctk.CTkLabel(frame, text="Dossier de destination :").pack(pady=5)
         self.download_dest_entry = ctk.CTkEntry(frame)
         self.download_dest_entry.pack(fill="x", padx=20)
 
-        last_dest = self.config_data.get("download_dest", "")
+        last_dest = self.settings.get("download_dest", "")
         if last_dest and os.path.isdir(last_dest):
             self.download_dest_entry.insert(0, last_dest)
 
@@ -90,120 +198,64 @@ class VideoToolApp(ctk.CTk):
         self.download_log = ctk.CTkTextbox(frame, height=8)
         self.download_log.pack(fill="both", padx=10, pady=10, expand=True)
 
-    def is_ffmpeg_available(self):
-        try:
-            subprocess.run([self.ffmpeg_path, "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except Exception:
-            return False
-
-
     def browse_download_folder(self):
         folder = filedialog.askdirectory(title="Choisir dossier destination téléchargement")
         if folder:
             self.download_dest_entry.delete(0, "end")
             self.download_dest_entry.insert(0, folder)
-            self.config_data["download_dest"] = folder
-            save_config(self.config_data)
+            self.settings.set("download_dest", folder)
 
     def log_download(self, msg):
-        self.download_log.configure(state="normal")
-        self.download_log.insert("end", msg + "\n")
-        self.download_log.see("end")
-        self.download_log.configure(state="disabled")
+        self.events.log("download", msg)
 
     def set_progress_download(self, progress):
-        self.download_progress.set(progress)
-
-    def extract_urls(self, text):
-        urls = re.findall(r'(https?://[^\s]+)', text)
-        return urls
+        self.events.progress("download", progress)
 
     def start_download_thread(self):
         threading.Thread(target=self.download_videos, daemon=True).start()
 
     def download_videos(self):
-        self.download_log.configure(state="normal")
-        self.download_log.delete("1.0", "end")
-        self.download_log.configure(state="disabled")
-        self.set_progress_download(0)
+        self.events.clear("download")
         text = self.download_text.get("1.0", "end").strip()
-        urls = self.extract_urls(text)
-        if not urls:
-            self.log_download("⚠️ Aucune URL valide détectée.")
-            return
-
+        urls = DownloadEngine.extract_urls(text)
         dest = self.download_dest_entry.get().strip()
-        if not os.path.isdir(dest):
-            self.log_download("⚠️ Le dossier de destination est invalide.")
-            return
-
-        if not self.is_ffmpeg_available():
-            self.log_download("❌ FFmpeg est requis pour fusionner l'audio et la vidéo, mais il est introuvable.")
-            self.log_download("👉 Installez-le depuis https://ffmpeg.org/download.html ou ajoutez-le au PATH.")
-            return
+        workers = int(self.download_workers_var.get())
 
-        self.config_data["download_dest"] = dest
-        save_config(self.config_data)
+        if urls and os.path.isdir(dest):
+            self.settings.update(download_dest=dest,
+                               download_workers=workers,
+                               audio_format=self.download_audio_var.get(),
+                               download_previews=self.download_previews_var.get())
 
-        res = self.download_res_var.get()
+        try:
+            rate_limit = parse_rate(self.settings.get("download_rate_limit"))
+        except ValueError as e:
+            self.log_download(f"⚠️ {e} : débit illimité.")
+            rate_limit = None
+        engine = DownloadEngine(self.ffmpeg_path, cookie_file=self.cookie_file, workers=workers,
+                                per_host=self.settings.get("download_per_host", 2),
+                                log=self.log_download, progress=self.set_progress_download,
+                                skip_done=self.download_skip_var.get(), rate_limit=rate_limit,
+                                fragments=self.settings.get("download_fragments", 4),
+                                retries=self.settings.get("download_retries", 3),
+                                audio_format=self.download_audio_var.get(),
+                                previews=self.make_previews(self.log_download)
+                                if self.download_previews_var.get() else None)
+        limit = self.download_limit_entry.get().strip()
         typ = self.download_type_var.get()
-
-        ydl_opts_base = {
-            "outtmpl": os.path.join(dest, "%(title)s.%(ext)s"),
-            "noplaylist": True,
-            "quiet": True,
-            "no_warnings": True,
-            "progress_hooks": [self.ydl_hook],
-            "cookiefile": self.cookie_file if os.path.isfile(self.cookie_file) else None,
-            "format": "bestvideo+bestaudio/best",
-            "merge_output_format": "mp4",
-            "ffmpeg_location": self.ffmpeg_path, 
-        }
-
-        for url in urls:
-            self.log_download(f"⬇️ Début téléchargement : {url}")
-
-            ydl_opts = ydl_opts_base.copy()
-
-            if typ == "audio":
-                ydl_opts["format"] = "bestaudio/best"
-                ydl_opts["postprocessors"] = [{
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }]
-            elif typ == "video":
-                if res == "best":
-                    ydl_opts["format"] = "bestvideo+bestaudio/best"
-                else:
-                    height = int(res.replace("p", ""))
-                    ydl_opts["format"] = f"bestvideo[height<={height}]+bestaudio/best"
-                ydl_opts["merge_output_format"] = "mp4"
-            else:  # both
-                ydl_opts["format"] = "bestvideo+bestaudio/best"
-                ydl_opts["merge_output_format"] = "mp4"
-
-            try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                self.log_download("✅ Téléchargement terminé.")
-            except Exception as e:
-                self.log_download(f"❌ Erreur: {e}")
-
-        self.set_progress_download(0)
-
-    def ydl_hook(self, d):
-        if d['status'] == 'downloading':
-            total = d.get('total_bytes') or d.get('total_bytes_estimate')
-            downloaded = d.get('downloaded_bytes', 0)
-            if total and total > 0:
-                progress = downloaded / total
-                self.set_progress_download(progress)
-                self.log_download(f"Téléchargement : {int(progress*100)}%")
-        elif d['status'] == 'finished':
-            self.set_progress_download(1)
-            self.log_download("Téléchargement terminé.")
+        out_fmt = size_mb = None
+        if self.download_stream_var.get():
+            size = self.download_size_entry.get().strip()
+            audio_format = self.download_audio_var.get()
+            out_fmt = "mp4" if typ != "audio" else "mp3" if audio_format == DEFAULT_AUDIO_FORMAT else audio_format
+            size_mb = int(size) if size.isdigit() and typ != "audio" else None
+        engine.download(urls, dest, self.download_res_var.get(), typ,
+                        playlist=self.download_playlist_var.get(),
+                        items=self.download_items_entry.get().strip() or None,
+                        limit=int(limit) if limit.isdigit() else None,
+                        out_fmt=out_fmt, size_mb=size_mb,
+                        profile=self.settings.get("encoder_profile", DEFAULT_PROFILE))
+        engine.close()
 
     # -------------- Onglet Compression --------------
     def create_compression_tab(self):
@@ -224,11 +276,24 @@ class VideoToolApp(ctk.CTk):
         )
         self.comp_size_menu.pack(pady=5)
 
+        ctk.CTkLabel(frame, text="Profil d'encodage :").pack(pady=5)
+        self.comp_profile_var = ctk.StringVar(value=self.settings.get("encoder_profile", DEFAULT_PROFILE))
+        self.comp_profile_menu = ctk.CTkOptionMenu(frame, values=list(PROFILES), variable=self.comp_profile_var)
+        self.comp_profile_menu.pack(pady=5)
+
+        self.comp_segmented_var = ctk.BooleanVar(value=self.settings.get("segmented_encoding", False))
+        ctk.CTkCheckBox(frame, text="Encodage segmenté en parallèle (vidéos longues)",
+                        variable=self.comp_segmented_var).pack(pady=5)
+
+        self.comp_previews_var = ctk.BooleanVar(value=self.settings.get("compression_previews", False))
+        ctk.CTkCheckBox(frame, text="Générer des aperçus (vignettes + planche)",
+                        variable=self.comp_previews_var).pack(pady=5)
+
         ctk.CTkLabel(frame, text="Dossier de destination :").pack(pady=5)
         self.comp_dest_entry = ctk.CTkEntry(frame)
         self.comp_dest_entry.pack(fill="x", padx=20)
 
-        last_dest = self.config_data.get("compression_dest", "")
+        last_dest = self.settings.get("compression_dest", "")
         if last_dest and os.path.isdir(last_dest):
             self.comp_dest_entry.insert(0, last_dest)
 
@@ -255,39 +320,25 @@ class VideoToolApp(ctk.CTk):
         if folder:
             self.comp_dest_entry.delete(0, "end")
             self.comp_dest_entry.insert(0, folder)
-            self.config_data["compression_dest"] = folder
-            save_config(self.config_data)
+            self.settings.set("compression_dest", folder)
 
     def log_comp(self, msg):
-        self.comp_log.configure(state="normal")
-        self.comp_log.insert("end", msg + "\n")
-        self.comp_log.see("end")
-        self.comp_log.configure(state="disabled")
+        self.events.log("comp", msg)
 
     def set_progress_comp(self, progress):
-        self.comp_progress.set(progress)
+        self.events.progress("comp", progress)
 
     def start_compress_thread(self):
         threading.Thread(target=self.compress_video, daemon=True).start()
 
     def compress_video(self):
-        self.comp_log.configure(state="normal")
-        self.comp_log.delete("1.0", "end")
-        self.comp_log.configure(state="disabled")
-        self.set_progress_comp(0)
+        self.events.clear("comp")
 
         input_file = self.comp_file_entry.get().strip()
-        if not os.path.isfile(input_file):
-            self.log_comp("⚠️ Fichier vidéo invalide.")
-            return
-
         dest_folder = self.comp_dest_entry.get().strip()
-        if not os.path.isdir(dest_folder):
-            self.log_comp("⚠️ Dossier destination invalide.")
-            return
-
-        self.config_data["compression_dest"] = dest_folder
-        save_config(self.config_data)
+        if os.path.isfile(input_file) and os.path.isdir(dest_folder):
+            self.settings.update(compression_dest=dest_folder,
+                               compression_previews=self.comp_previews_var.get())
 
         size_str = self.comp_size_var.get()
         if size_str == "Compression max (0 Mo)":
@@ -295,76 +346,19 @@ class VideoToolApp(ctk.CTk):
         else:
             size_mb = int(size_str.split()[0]) 
 
-        size_bytes = size_mb * 1024 * 1024
-
-        base = os.path.basename(input_file)
-        name, ext = os.path.splitext(base)
-        output_file = os.path.join(dest_folder, f"{name}_compressed.mp4")
-
-        if not self.ffmpeg_path or not os.path.isfile(self.ffmpeg_path):
-            self.log_comp("⚠️ ffmpeg.exe non configuré ou introuvable.")
-            return
-
-        duration = self.get_video_duration(input_file)
-        if duration is None or duration == 0:
-            self.log_comp("⚠️ Impossible d'obtenir la durée vidéo.")
-            return
-
-        if size_mb == 0:
-            bitrate = "500k" 
-        else:
-            target_bits = size_bytes * 8
-            bitrate_val = int(target_bits / duration) 
-            bitrate_k = int(bitrate_val / 1000)       
-            bitrate = f"{bitrate_k}k"
-
-
-        self.log_comp(f"Durée vidéo: {duration:.2f}s")
-        self.log_comp(f"Débit cible: {bitrate}")
-
-        cmd = [
-            self.ffmpeg_path,
-            "-i", input_file,
-            "-b:v", bitrate,
-            "-bufsize", bitrate,
-            "-maxrate", bitrate,
-            "-y",
-            output_file
-        ]
-
-        self.log_comp("Lancement compression...")
-        try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-
-            while True:
-                line = proc.stderr.readline()
-                if not line:
-                    break
-                self.log_comp(line.strip())
-
-            proc.wait()
-            if proc.returncode == 0:
-                self.log_comp(f"✅ Compression terminée : {output_file}")
-                self.set_progress_comp(1)
-            else:
-                self.log_comp(f"❌ Erreur lors de la compression, code {proc.returncode}")
-                self.set_progress_comp(0)
-        except Exception as e:
-            self.log_comp(f"Erreur compression : {e}")
-            self.set_progress_comp(0)
-
-
-    def get_video_duration(self, file):
-        if not self.ffmpeg_path or not os.path.isfile(self.ffmpeg_path):
-            return None
-        cmd = [self.ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe"), "-v", "error", "-show_entries",
-            "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file]
-        try:
-            output = subprocess.check_output(cmd, universal_newlines=True).strip()
-            return float(output)
-        except Exception:
-            return None
+        engine = CompressionEngine(self.ffmpeg_path, log=self.log_comp, progress=self.set_progress_comp,
+                                   profile=self.comp_profile_var.get(),
+                                   segmented=self.comp_segmented_var.get(),
+                                   previews=self.make_previews(self.log_comp)
+                                   if self.comp_previews_var.get() else None)
+        engine.compress(input_file, dest_folder, size_mb)
 
+    def make_previews(self, log):
+        # Import tardif : étape optionnelle après téléchargement ou compression
+        from previews import PreviewGenerator
+        return PreviewGenerator(self.ffmpeg_path, count=self.settings.get("preview_count", 9),
+                                width=self.settings.get("preview_width", 320),
+                                columns=self.settings.get("preview_columns", 3), log=log)
 
     # -------------- Onglet Conversion --------------
     def create_conversion_tab(self):
@@ -405,14 +399,26 @@ class VideoToolApp(ctk.CTk):
         self.folder_format_menu = ctk.CTkOptionMenu(self.folder_frame, variable=self.folder_format_var, values=[])
         self.folder_format_menu.pack(fill="x", padx=10, pady=(0,10))
 
+        self.folder_recursive_var = ctk.BooleanVar(value=self.settings.get("conversion_recursive", False))
+        ctk.CTkCheckBox(self.folder_frame, text="Inclure les sous-dossiers",
+                        variable=self.folder_recursive_var).pack(anchor="w", padx=10, pady=2)
+        self.folder_watch_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_frame, text="Surveiller le dossier (nouveaux fichiers)",
+                        variable=self.folder_watch_var).pack(anchor="w", padx=10, pady=(2,10))
+        self.watch_stop = None
+
         ctk.CTkLabel(frame, text="📥 Dossier de destination :", anchor="w").pack(fill="x", padx=20, pady=(10,0))
         self.conv_dest_entry = ctk.CTkEntry(frame)
         self.conv_dest_entry.pack(fill="x", padx=20)
-        last = self.config_data.get("conversion_dest", "")
+        last = self.settings.get("conversion_dest", "")
         if last and os.path.isdir(last):
             self.conv_dest_entry.insert(0, last)
         ctk.CTkButton(frame, text="Choisir dossier de sortie", command=self.browse_conv_dest).pack(pady=5)
 
+        ctk.CTkLabel(frame, text="Profil d'encodage (si transcodage) :", anchor="w").pack(fill="x", padx=20)
+        self.conv_profile_var = ctk.StringVar(value=self.settings.get("encoder_profile", DEFAULT_PROFILE))
+        ctk.CTkOptionMenu(frame, values=list(PROFILES), variable=self.conv_profile_var).pack(padx=20, anchor="w")
+
         self.conv_btn = ctk.CTkButton(frame, text="🚀 Convertir", font=("Arial",14,"bold"), command=self.start_convert_thread)
         self.conv_btn.pack(pady=(10,5))
 
@@ -439,7 +445,7 @@ class VideoToolApp(ctk.CTk):
         self.conv_file_entry.delete(0,"end")
         self.conv_file_entry.insert(0,path)
         ext = os.path.splitext(path)[1].lower()
-        opts = self.detect_types([ext])
+        opts = detect_types([ext])
         self.file_format_menu.configure(values=opts)
         self.file_format_var.set(opts[0])
 
@@ -449,8 +455,10 @@ class VideoToolApp(ctk.CTk):
             return
         self.folder_path_entry.delete(0,"end")
         self.folder_path_entry.insert(0,folder)
-        exts = {os.path.splitext(f)[1].lower() for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))}
-        opts = self.detect_types(list(exts))
+        # Échantillon borné : l'arborescence peut être très grande
+        entries = itertools.islice(scan(folder, recursive=self.folder_recursive_var.get()), 5000)
+        exts = {os.path.splitext(e.name)[1].lower() for e in entries}
+        opts = detect_types(list(exts))
         self.folder_format_menu.configure(values=opts)
         self.folder_format_var.set(opts[0])
 
@@ -460,119 +468,73 @@ class VideoToolApp(ctk.CTk):
             return
         self.conv_dest_entry.delete(0,"end")
         self.conv_dest_entry.insert(0,folder)
-        self.config_data["conversion_dest"] = folder
-
-    def detect_types(self, exts):
-        types = set()
-        for e in exts:
-            if e in ['.mp4','.mkv','.avi','.mov','.webm','.flv']:
-                types |= set(self.format_map['video'])
-            elif e in ['.mp3','.wav','.flac','.ogg','.aac','.m4a']:
-                types |= set(self.format_map['audio'])
-            elif e in ['.jpg','.jpeg','.png','.gif','.bmp','.webp']:
-                types |= set(self.format_map['image'])
-            elif e in ['.pdf','.docx','.txt','.xlsx','.pptx']:
-                types |= set(self.format_map['doc'])
-            elif e in ['.zip','.tar','.gz','.rar','.7z']:
-                types |= set(self.format_map['archive'])
-        return sorted(types) if types else ['mp4','mp3','png','pdf']
+        self.settings.set("conversion_dest", folder)
 
     def start_convert_thread(self):
+        if self.watch_stop is not None:
+            # Deuxième clic : arrêt de la surveillance en cours
+            self.watch_stop.set()
+            self.watch_stop = None
+            self.conv_btn.configure(text="🚀 Convertir")
+            return
         mode = self.mode.get()
+        if mode == "folder" and self.folder_watch_var.get():
+            self.watch_stop = threading.Event()
+            self.conv_btn.configure(text="⏹️ Arrêter la surveillance")
         if mode=="file":
             threading.Thread(target=self.convert_file, daemon=True).start()
         else:
             threading.Thread(target=self.convert_folder, daemon=True).start()
 
+    def conversion_engine(self):
+        return ConversionEngine(self.ffmpeg_path,
+                                threads_per_job=self.settings.get("conversion_threads", 2),
+                                workers=self.settings.get("conversion_workers"),
+                                log=self.log_conv, progress=self.set_progress_conv,
+                                profile=self.conv_profile_var.get())
+
     def convert_file(self):
         self.log_conv("")  
-        self.set_progress_conv(0)
         inp = self.conv_file_entry.get().strip()
         out_fmt = self.file_format_var.get().strip()
         dst = self.conv_dest_entry.get().strip()
-
-        if not os.path.isfile(inp):
-            return self.log_conv("⚠️ Fichier invalide.")
-        if not out_fmt:
-            return self.log_conv("⚠️ Choisissez un format.")
-        if not os.path.isdir(dst):
-            return self.log_conv("⚠️ Dossier de destination invalide.")
-        if not self.ffmpeg_path or not os.path.isfile(self.ffmpeg_path):
-            return self.log_conv("⚠️ ffmpeg non configuré.")
-
-        name,_ = os.path.splitext(os.path.basename(inp))
-        out = os.path.join(dst, f"{name}_converted.{out_fmt}")
-        cmd = [self.ffmpeg_path, "-y", "-i", inp, out]
-        self.log_conv(f"🔄 1/1 : {os.path.basename(inp)} → {out_fmt}")
-        proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
-        for line in proc.stderr:
-            self.log_conv(line.strip())
-        proc.wait()
-        if proc.returncode==0:
-            self.log_conv(f"✅ Terminé : {out}")
-            self.set_progress_conv(1)
-        else:
-            self.log_conv(f"❌ Erreur {proc.returncode}")
+        self.conversion_engine().convert_file(inp, out_fmt, dst)
 
     def convert_folder(self):
         self.log_conv("")  
-        self.set_progress_conv(0)
         folder = self.folder_path_entry.get().strip()
         out_fmt = self.folder_format_var.get().strip()
         dst = self.conv_dest_entry.get().strip()
+        recursive = self.folder_recursive_var.get()
+        self.settings.set("conversion_recursive", recursive)
+        stop = self.watch_stop
+        if stop is None:
+            self.conversion_engine().convert_folder(folder, out_fmt, dst, recursive=recursive)
+        else:
+            self.conversion_engine().watch(folder, out_fmt, dst, stop=stop, recursive=recursive)
+            # Retour anticipé (dossier, format ou destination invalide) ou arrêt : bouton rétabli
+            self.events.finished("conv", stop)
 
-        if not os.path.isdir(folder):
-            return self.log_conv("⚠️ Dossier invalide.")
-        if not out_fmt:
-            return self.log_conv("⚠️ Choisissez un format.")
-        if not os.path.isdir(dst):
-            return self.log_conv("⚠️ Dossier de destination invalide.")
-        if not self.ffmpeg_path or not os.path.isfile(self.ffmpeg_path):
-            return self.log_conv("⚠️ ffmpeg non configuré.")
-
-        exts = tuple(['.'+ext for ext in self.format_map['video']+self.format_map['audio']+
-                    self.format_map['image']+self.format_map['doc']])
-        files = [os.path.join(folder,f) for f in os.listdir(folder) if f.lower().endswith(exts)]
-        if not files:
-            return self.log_conv("⚠️ Aucun fichier compatible trouvé.")
-
-        total = len(files)
-        self.log_conv(f"🔁 {total} fichiers à convertir...")
-        for i,f in enumerate(files, start=1):
-            name,_ = os.path.splitext(os.path.basename(f))
-            out = os.path.join(dst, f"{name}_converted.{out_fmt}")
-            cmd = [self.ffmpeg_path, "-y", "-i", f, out]
-            self.log_conv(f"🔄 {i}/{total} : {os.path.basename(f)} → {out_fmt}")
-            proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
-            for line in proc.stderr:
-                self.log_conv(line.strip())
-            proc.wait()
-            if proc.returncode==0:
-                self.log_conv(f"✅ {os.path.basename(out)}")
-            else:
-                self.log_conv(f"❌ Erreur {proc.returncode}")
-            self.set_progress_conv(i/total)
-        self.log_conv("🎉 Tout est terminé !")
+    def watch_finished(self, stop):
+        if self.watch_stop is stop:
+            self.watch_stop = None
+            self.conv_btn.configure(text="🚀 Convertir")
 
     def log_conv(self, text):
-        # Ajoute le texte au widget log
-        self.conv_log.configure(state="normal")
+        # Texte vide = effacer le log
         if text == "":
-            self.conv_log.delete("0.0", "end")
+            self.events.clear("conv")
         else:
-            self.conv_log.insert("end", text + "\n")
-            self.conv_log.see("end")
-        self.conv_log.configure(state="disabled")
+            self.events.log("conv", text)
 
     def set_progress_conv(self, value):
-        self.conv_progress.set(value)
-        self.update_idletasks()
+        self.events.progress("conv", value)
 
     # -------------- Onglet Configuration --------------
     def create_config_tab(self):
         frame = self.notebook.tab("Configuration")
 
-        ctk.CTkLabel(frame, text="Sélectionnez le chemin vers ffmpeg.exe :").pack(pady=5)
+        ctk.CTkLabel(frame, text="Sélectionnez le chemin vers ffmpeg :").pack(pady=5)
 
         self.ffmpeg_entry = ctk.CTkEntry(frame)
         self.ffmpeg_entry.pack(fill="x", padx=20)
@@ -586,21 +548,74 @@ class VideoToolApp(ctk.CTk):
 
         ctk.CTkLabel(frame, text="Fichier cookie YouTube (cookieyt.txt) sera utilisé si présent dans le même dossier que ce script.").pack(pady=20)
 
+        # Profils de job : concurrence, profils d'encodage et destinations sous un nom (aussi : videotool --job-profile)
+        ctk.CTkLabel(frame, text="Profil de job :").pack(pady=5)
+        self.job_profile_var = ctk.StringVar(value=self.settings.get("active_profile") or self.NO_PROFILE)
+        self.job_profile_menu = ctk.CTkOptionMenu(frame, values=[self.NO_PROFILE] + self.settings.profiles(),
+                                                  variable=self.job_profile_var, command=self.apply_job_profile)
+        self.job_profile_menu.pack(pady=5)
+        profile_row = ctk.CTkFrame(frame, fg_color="transparent")
+        profile_row.pack()
+        self.job_profile_entry = ctk.CTkEntry(profile_row, width=160, placeholder_text="Nom du profil")
+        self.job_profile_entry.pack(side="left", padx=5)
+        ctk.CTkButton(profile_row, text="Enregistrer les réglages", command=self.save_job_profile).pack(side="left", padx=5)
+
+    def apply_job_profile(self, name):
+        self.settings.activate("" if name == self.NO_PROFILE else name)
+        # Les widgets reflètent les réglages du profil choisi
+        for entry, key in ((self.download_dest_entry, "download_dest"), (self.comp_dest_entry, "compression_dest"),
+                           (self.conv_dest_entry, "conversion_dest")):
+            entry.delete(0, "end")
+            entry.insert(0, self.settings.get(key, ""))
+        self.download_workers_var.set(str(self.settings.get("download_workers", 4)))
+        self.download_audio_var.set(self.settings.get("audio_format", DEFAULT_AUDIO_FORMAT))
+        self.download_previews_var.set(self.settings.get("download_previews", False))
+        self.comp_profile_var.set(self.settings.get("encoder_profile", DEFAULT_PROFILE))
+        self.conv_profile_var.set(self.settings.get("encoder_profile", DEFAULT_PROFILE))
+        self.comp_segmented_var.set(self.settings.get("segmented_encoding", False))
+        self.comp_previews_var.set(self.settings.get("compression_previews", False))
+        self.folder_recursive_var.set(self.settings.get("conversion_recursive", False))
+
+    def save_job_profile(self):
+        name = self.job_profile_entry.get().strip()
+        if not name or name == self.NO_PROFILE:
+            messagebox.showerror("Erreur", "Nom de profil invalide")
+            return
+        values = {key: self.settings.get(key) for key in PROFILE_KEYS if self.settings.get(key) is not None}
+        values.update(download_dest=self.download_dest_entry.get().strip(),
+                      compression_dest=self.comp_dest_entry.get().strip(),
+                      conversion_dest=self.conv_dest_entry.get().strip(),
+                      download_workers=self.download_workers_var.get(),
+                      audio_format=self.download_audio_var.get(),
+                      encoder_profile=self.comp_profile_var.get(),
+                      segmented_encoding=self.comp_segmented_var.get(),
+                      download_previews=self.download_previews_var.get(),
+                      compression_previews=self.comp_previews_var.get(),
+                      conversion_recursive=self.folder_recursive_var.get())
+        self.settings.save_profile(name, values)
+        self.settings.activate(name)
+        self.job_profile_menu.configure(values=[self.NO_PROFILE] + self.settings.profiles())
+        self.job_profile_var.set(name)
+        messagebox.showinfo("Succès", f"Profil « {name} » enregistré.")
+
     def browse_ffmpeg(self):
-        file = filedialog.askopenfilename(title="Choisir ffmpeg.exe", filetypes=[("Executable", "ffmpeg.exe")])
+        file = filedialog.askopenfilename(title="Choisir ffmpeg",
+                                          filetypes=[("ffmpeg", "ffmpeg*"), ("Tous les fichiers", "*")])
         if file:
             self.ffmpeg_entry.delete(0, "end")
             self.ffmpeg_entry.insert(0, file)
 
     def save_ffmpeg_path(self):
         path = self.ffmpeg_entry.get().strip()
-        if os.path.isfile(path) and path.lower().endswith("ffmpeg.exe"):
+        caps = capabilities(path) if is_ffmpeg(path) else None
+        if caps:
             self.ffmpeg_path = path
-            self.config_data["ffmpeg_path"] = path
-            save_config(self.config_data)
-            messagebox.showinfo("Succès", "Chemin ffmpeg.exe sauvegardé.")
+            self.settings.set("ffmpeg_path", path)
+            hwaccels = ", ".join(caps["hwaccels"]) or "aucune"
+            messagebox.showinfo("Succès", f"Chemin ffmpeg sauvegardé.\nVersion {caps['version'] or '?'}, "
+                                          f"{len(caps['encoders'])} encodeurs, accélération : {hwaccels}")
         else:
-            messagebox.showerror("Erreur", "Chemin invalide ou fichier non ffmpeg.exe")
+            messagebox.showerror("Erreur", "Chemin invalide ou fichier non ffmpeg")
 
 if __name__ == "__main__":
     ctk.set_appearance_mode("System")  
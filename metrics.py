@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import cProfile
+import itertools
+import threading
+import collections
+from contextlib import contextmanager
+
+# ----- JOB METRICS -----
+# Un enregistrement par étape (download, probe, encode, convert) : durée, octets, vitesse ffmpeg,
+# nouvelles tentatives, attente en file. Export JSON lines (au fil de l'eau) et Prometheus (texte).
+class Metrics:
+    FLUSH_EVERY = 5.0
+    TOTALS = ("seconds", "bytes_in", "bytes_out", "retries", "queue_wait", "ffmpeg_seconds", "media_seconds")
+
+    def __init__(self, max_records=10000):
+        self.records = collections.deque(maxlen=max_records)
+        self.jsonl = None
+        self.prometheus = None
+        self.profile_dir = None
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seq = itertools.count(1)
+        self._last_flush = 0.0
+
+    def configure(self, jsonl=None, prometheus=None, profile_dir=None):
+        self.jsonl = jsonl or None
+        self.prometheus = prometheus or None
+        self.profile_dir = profile_dir or None
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def stage(self, stage, job="", **fields):
+        # L'appelant complète le dict (bytes_out, retries, ok=False...) pendant l'étape
+        record = {"stage": stage, "job": str(job), "started": round(time.time(), 3), "ok": True}
+        record.update(fields)
+        stack = self._stack()
+        outermost = not stack
+        stack.append(record)
+        profiler, thread, name = self._start_profile(stage, job) if outermost else (None, None, None)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["ok"] = False
+            record.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            stack.pop()
+            self._stop_profile(profiler, thread, name, stage)
+            self.add(record)
+
+    @contextmanager
+    def attach(self, record):
+        # Thread auxiliaire (segments encodés en parallèle) : ses runs ffmpeg comptent dans l'étape parente
+        stack = self._stack()
+        if record is not None:
+            stack.append(record)
+        try:
+            yield record
+        finally:
+            if record is not None:
+                stack.pop()
+
+    def _start_profile(self, stage, job):
+        if not self.profile_dir:
+            return None, None, None
+        # Nom de thread explicite : visible dans py-spy dump / top
+        thread = threading.current_thread()
+        name = thread.name
+        thread.name = f"videotool:{stage}:{os.path.basename(str(job))[:40]}"
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ : un seul profileur actif à la fois, les autres étapes ne sont pas profilées
+            profiler = None
+        return profiler, thread, name
+
+    def _stop_profile(self, profiler, thread, name, stage):
+        if thread is not None:
+            thread.name = name
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{next(self._seq):05d}-{stage}.prof"))
+
+    def ffmpeg_done(self, progress, elapsed):
+        # Appelé par run_ffmpeg : rattache le temps média traité à l'étape en cours de ce thread
+        record = self.current()
+        if record is None:
+            return
+        # Même enregistrement possiblement partagé entre threads (attach)
+        with self._lock:
+            record["ffmpeg_runs"] = record.get("ffmpeg_runs", 0) + 1
+            record["ffmpeg_seconds"] = round(record.get("ffmpeg_seconds", 0) + elapsed, 4)
+            record["media_seconds"] = round(record.get("media_seconds", 0) + progress.out_time, 3)
+            if record["ffmpeg_seconds"]:
+                record["speed"] = round(record["media_seconds"] / record["ffmpeg_seconds"], 3)
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+            total = self._totals.setdefault(record["stage"], collections.Counter())
+            total["ok" if record.get("ok") else "failed"] += 1
+            for key in self.TOTALS:
+                total[key] += record.get(key) or 0
+            if self.jsonl:
+                try:
+                    with open(self.jsonl, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass
+            due = self.prometheus and time.monotonic() - self._last_flush >= self.FLUSH_EVERY
+        if due:
+            self.flush()
+
+    def summary(self):
+        with self._lock:
+            empty = dict.fromkeys(("ok", "failed") + self.TOTALS, 0)
+            return {stage: {**empty, **total} for stage, total in self._totals.items()}
+
+    def prometheus_text(self):
+        metrics = [
+            ("jobs_total", "counter", "Étapes terminées", None),
+            ("seconds_total", "counter", "Durée cumulée des étapes", "seconds"),
+            ("bytes_in_total", "counter", "Octets lus", "bytes_in"),
+            ("bytes_out_total", "counter", "Octets écrits", "bytes_out"),
+            ("retries_total", "counter", "Nouvelles tentatives", "retries"),
+            ("queue_wait_seconds_total", "counter", "Attente en file cumulée", "queue_wait"),
+            ("ffmpeg_seconds_total", "counter", "Temps passé dans ffmpeg", "ffmpeg_seconds"),
+            ("media_seconds_total", "counter", "Durée de média traitée par ffmpeg", "media_seconds"),
+        ]
+        summary = self.summary()
+        lines = []
+        for name, kind, help_text, key in metrics:
+            lines += [f"# HELP videotool_stage_{name} {help_text}", f"# TYPE videotool_stage_{name} {kind}"]
+            for stage, total in sorted(summary.items()):
+                if key is None:
+                    for status in ("ok", "failed"):
+                        lines.append(f'videotool_stage_{name}{{stage="{stage}",status="{status}"}} '
+                                     f"{total.get(status, 0)}")
+                else:
+                    lines.append(f'videotool_stage_{name}{{stage="{stage}"}} {round(total.get(key, 0), 4)}')
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        if not self.prometheus:
+            return
+        self._last_flush = time.monotonic()
+        # Écriture atomique : un collecteur (node_exporter textfile) ne lit jamais un fichier partiel
+        tmp = self.prometheus + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, self.prometheus)
+        except OSError:
+            pass
+
+metrics = Metrics()
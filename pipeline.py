@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+from engine import TargetSizeEncoder, conversion_plan, get_video_duration, progress_args, NO_DURATION
+from tools import encoders_for
+from journal import temp_output
+from profiles import DEFAULT_PROFILE, video_args
+
+# ----- STREAM INPUTS -----
+# ffmpeg lit directement les URLs des formats choisis par yt-dlp : aucun fichier intermédiaire.
+STREAMABLE = {"http", "https", "m3u8", "m3u8_native"}
+
+def stream_inputs(info):
+    # [(url, en-têtes HTTP)] pour la vidéo puis l'audio ; None si un protocole n'est pas lisible par ffmpeg
+    formats = info.get("requested_formats") or [info]
+    inputs = []
+    for fmt in formats:
+        if not fmt.get("url") or (fmt.get("protocol") or "https") not in STREAMABLE:
+            return None
+        inputs.append((fmt["url"], fmt.get("http_headers") or {}))
+    return inputs
+
+def input_args(inputs):
+    args = []
+    for url, headers in inputs:
+        if headers:
+            args += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+        if url.startswith(("http://", "https://")):
+            args += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "10"]
+        args += ["-i", url]
+    if len(inputs) > 1:
+        args += ["-map", "0:v:0", "-map", "1:a:0"]
+    return args
+
+# ----- STREAMING ENCODER -----
+class StreamingEncoder(TargetSizeEncoder):
+    # Taille cible en une seule lecture du flux : 1 passe à débit moyen, sans ré-encodage correctif
+    # (chaque passe supplémentaire retéléchargerait la source).
+    MARGIN = 0.97
+
+    def __init__(self, ffmpeg_path, inputs, log=print, progress=None, profile=DEFAULT_PROFILE):
+        super().__init__(ffmpeg_path, log=log, progress=progress, profile=profile)
+        self.profile_name = profile
+        self.inputs = inputs
+
+    def _base(self, input_file=None):
+        return [self.ffmpeg_path, "-y", *progress_args(), *input_args(self.inputs), *video_args(self.profile)]
+
+    def encode(self, input_file, output_file, size_bytes, duration):
+        self.log(f"Profil : {self.profile['codec']} {self.profile['preset']} (flux direct)")
+        if size_bytes == 0:
+            return self.encode_crf(None, output_file, duration, self.profile["max_crf"])
+        audio_bps = self.audio_bitrate(size_bytes, duration)
+        video_bps = int(self.video_bitrate(size_bytes, duration, audio_bps) * self.MARGIN)
+        self.log(f"Débit cible: vidéo {video_bps // 1000}k + audio {audio_bps // 1000}k")
+        returncode = self.encode_single_pass(None, output_file, duration, video_bps, audio_bps)
+        if returncode == 0:
+            actual = os.path.getsize(output_file)
+            self.log(f"Taille obtenue : {actual / (1024 * 1024):.2f} Mo / {size_bytes / (1024 * 1024):.0f} Mo")
+            if actual > size_bytes:
+                self.log("⚠️ Taille au-dessus de la cible : relancez en compression classique (2 passes).")
+        return returncode
+
+    def convert(self, output_file, out_fmt, duration):
+        # Pas de sonde du flux : réglages de transcodage du format cible
+        _, args = conversion_plan(None, out_fmt, self.profile_name, encoders_for(self.ffmpeg_path))
+        cmd = [self.ffmpeg_path, "-y", *progress_args(), *input_args(self.inputs), *args, output_file]
+        return self._run(cmd, duration, 0, 1)
+
+# ----- PIPELINE -----
+class StreamPipeline:
+    # Téléchargement -> transcodage : seule la sortie finale est écrite sur le disque.
+    # Si un format n'est pas lisible en flux (DASH fragmenté...), repli sur un fichier temporaire.
+    def __init__(self, downloader, profile=DEFAULT_PROFILE):
+        self.downloader = downloader
+        self.profile = profile
+
+    def output_path(self, ydl, info, dest, out_fmt):
+        name = os.path.splitext(os.path.basename(ydl.prepare_filename(info)))[0]
+        return os.path.join(dest, f"{name}.{out_fmt}")
+
+    def run(self, url, dest, opts, out_fmt="mp4", size_mb=None, log=print, progress=None):
+        session = self.downloader.session
+        with session.client(opts) as ydl:
+            info = ydl.process_ie_result(session.info(ydl, url), download=False)
+            out = self.output_path(ydl, info, dest, out_fmt)
+        duration = info.get("duration") or 0
+        inputs = stream_inputs(info)
+        workdir = None
+        if inputs is not None and session.budget:
+            # ffmpeg lirait les URLs hors du partage de débit : la limite ne s'appliquerait pas
+            log("↪️ Limite de débit active : flux direct désactivé, passage par un fichier temporaire.")
+            inputs = None
+        elif inputs is None or not duration:
+            log("↪️ Flux non lisible directement par ffmpeg : passage par un fichier temporaire.")
+        if inputs is None or not duration:
+            workdir = tempfile.mkdtemp(prefix="videotool-stream-", dir=dest)
+            info = session.download(dict(opts, outtmpl=os.path.join(workdir, "source.%(ext)s")), url)
+            path = info.get("requested_downloads", [{}])[0].get("filepath") or info.get("filepath")
+            inputs = [(path, {})]
+            duration = duration or get_video_duration(self.downloader.ffmpeg_path, path) or 0
+        if size_mb and duration <= 0:
+            # Erreur définitive (PERMANENT_ERRORS) : pas de nouveau téléchargement complet à chaque essai
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+            raise RuntimeError(f"{NO_DURATION} : taille cible impossible à calculer")
+        encoder = StreamingEncoder(self.downloader.ffmpeg_path, inputs, log=log, progress=progress,
+                                   profile=self.profile)
+        tmp = temp_output(out)
+        try:
+            if size_mb is not None:
+                returncode = encoder.encode(None, tmp, int(size_mb) * 1024 * 1024, duration)
+            else:
+                returncode = encoder.convert(tmp, out_fmt, duration)
+            if returncode == 0:
+                os.replace(tmp, out)
+                return info, out
+            raise RuntimeError(f"ffmpeg a échoué (code {returncode})")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
@@ -0,0 +1,63 @@
+# ----- REMUX PLANNER -----
+# Codecs acceptés tels quels par chaque conteneur cible (None = tout est accepté)
+CONTAINER_CODECS = {
+    'mp4':  ({'h264', 'hevc', 'mpeg4', 'av1'}, {'aac', 'mp3', 'ac3', 'eac3', 'alac'}),
+    'mov':  ({'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg'}, {'aac', 'mp3', 'ac3', 'alac', 'pcm_s16le'}),
+    'mkv':  (None, None),
+    'webm': ({'vp8', 'vp9', 'av1'}, {'opus', 'vorbis'}),
+    'avi':  ({'mpeg4', 'h264', 'mjpeg', 'msmpeg4v3'}, {'mp3', 'ac3', 'pcm_s16le'}),
+    'flv':  ({'h264', 'flv1'}, {'aac', 'mp3'}),
+    'mp3':  (set(), {'mp3'}),
+    'aac':  (set(), {'aac'}),
+    'm4a':  (set(), {'aac', 'alac'}),
+    'ogg':  (set(), {'vorbis', 'opus'}),
+    'opus': (set(), {'opus'}),
+    'flac': (set(), {'flac'}),
+    'wav':  (set(), {'pcm_s16le', 'pcm_s24le', 'pcm_f32le'}),
+}
+
+# Encodeur audio utilisé quand seule la piste audio doit être ré-encodée
+AUDIO_ENCODERS = {
+    'mp4': 'aac', 'mov': 'aac', 'flv': 'aac', 'webm': 'libopus', 'avi': 'libmp3lame',
+}
+
+# Conteneurs qui n'acceptent pas les sous-titres texte en copie
+NO_SUBTITLES = {'mp4', 'mov', 'webm', 'avi', 'flv'}
+
+def streams_of(data, kind):
+    streams = (data or {}).get("streams", [])
+    return [s.get("codec_name", "") for s in streams
+            if s.get("codec_type") == kind and not s.get("disposition", {}).get("attached_pic")]
+
+def plan_conversion(data, out_fmt):
+    # Retourne (mode, args) : "copy" (remux), "partial" (copie vidéo, audio ré-encodé) ou "transcode"
+    if out_fmt not in CONTAINER_CODECS or not data:
+        return "transcode", []
+    video_ok, audio_ok = CONTAINER_CODECS[out_fmt]
+    video = streams_of(data, "video")
+    audio = streams_of(data, "audio")
+    audio_only = video_ok is not None and not video_ok
+
+    def compatible(codecs, allowed):
+        return allowed is None or all(c in allowed for c in codecs)
+
+    if audio_only:
+        if audio and compatible(audio, audio_ok):
+            return "copy", ["-vn", "-sn", "-c:a", "copy"]
+        return "transcode", []
+
+    if not video and not audio:
+        return "transcode", []
+    extra = ["-sn"] if out_fmt in NO_SUBTITLES else []
+    if compatible(video, video_ok):
+        if compatible(audio, audio_ok):
+            return "copy", ["-c", "copy"] + extra
+        if out_fmt in AUDIO_ENCODERS:
+            return "partial", ["-c:v", "copy", "-c:a", AUDIO_ENCODERS[out_fmt]] + extra
+    return "transcode", []
+
+PLAN_LABELS = {
+    "copy": "⚡ remux (copie des flux)",
+    "partial": "⚡ copie vidéo, audio ré-encodé",
+    "transcode": "🔄 transcodage complet",
+}
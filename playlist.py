@@ -0,0 +1,59 @@
+# ----- PLAYLIST EXPANSION -----
+# Les entrées sont lues paresseusement (extract_flat, process=False) : le premier élément
+# est disponible dès la première page de la playlist ou de la chaîne.
+NESTED_EXTRACTORS = ("Tab", "Playlist", "Channel")
+
+def parse_items(spec):
+    # "1-10,15,20-" -> [(1, 10), (15, 15), (20, None)]
+    ranges = []
+    for part in (spec or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        start = int(start) if start else 1
+        ranges.append((start, (int(end) if end else None) if sep else start))
+    return ranges
+
+def item_selected(ranges, idx):
+    return not ranges or any(start <= idx and (end is None or idx <= end) for start, end in ranges)
+
+def items_exhausted(ranges, idx):
+    return bool(ranges) and all(end is not None and idx > end for _, end in ranges)
+
+def is_playlist(info):
+    return info.get("_type") in ("playlist", "multi_video")
+
+def flat_entries(ydl, info, depth=0):
+    for entry in info.get("entries") or []:
+        if not entry:
+            continue
+        nested = entry.get("_type") == "playlist" or any(
+            name in (entry.get("ie_key") or "") for name in NESTED_EXTRACTORS)
+        if nested and depth < 2 and entry.get("url"):
+            # Chaîne -> onglets (Vidéos, Shorts...) -> vidéos
+            sub = ydl.extract_info(entry["url"], download=False, process=False)
+            if is_playlist(sub):
+                yield from flat_entries(ydl, sub, depth + 1)
+                continue
+        yield entry
+
+def expand(ydl, url, items=None, limit=None, session=None):
+    # session (YDLSession) : une URL simple reste en cache et n'est pas réextraite au téléchargement
+    info = session.info(ydl, url) if session else ydl.extract_info(url, download=False, process=False)
+    if not is_playlist(info):
+        yield url
+        return
+    ranges = parse_items(items)
+    count = 0
+    for idx, entry in enumerate(flat_entries(ydl, info), start=1):
+        if items_exhausted(ranges, idx):
+            break
+        if not item_selected(ranges, idx):
+            continue
+        entry_url = entry.get("webpage_url") or entry.get("url")
+        if not entry_url:
+            continue
+        yield entry_url
+        count += 1
+        if limit and count >= limit:
+            break
@@ -0,0 +1,106 @@
+import os
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from engine import ffmpeg_ready, file_size
+from journal import JobJournal, temp_output
+from metrics import metrics
+from probe import probe_for
+
+# ----- PREVIEWS -----
+class PreviewGenerator:
+    # N vignettes + une planche (sprite) par vidéo. Recherche côté entrée (-ss avant -i) et décodage
+    # des seules images clés (-skip_frame nokey) : quelques images décodées au lieu du fichier entier.
+    def __init__(self, ffmpeg_path, count=9, width=320, columns=3, workers=None, log=print, journal=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.count = max(1, int(count))
+        self.width = int(width)
+        self.columns = max(1, min(int(columns), self.count))
+        self.workers = workers or os.cpu_count() or 1
+        self.log = log
+        self.journal = journal if journal is not None else JobJournal()
+
+    @property
+    def params(self):
+        return {"previews": self.count, "width": self.width, "columns": self.columns}
+
+    @staticmethod
+    def folder_for(video):
+        name, _ = os.path.splitext(video)
+        return name + "_previews"
+
+    def timestamps(self, duration):
+        # Milieu de chaque tranche : ni l'écran noir du début, ni le générique de fin
+        return [duration * (i + 0.5) / self.count for i in range(self.count)]
+
+    def thumbnail(self, video, at, out):
+        tmp = temp_output(out)
+        cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y",
+               "-skip_frame", "nokey", "-noaccurate_seek", "-ss", f"{at:.3f}", "-i", video,
+               "-frames:v", "1", "-vf", f"scale={self.width}:-2", "-q:v", "3", tmp]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0 and os.path.isfile(tmp):
+            os.replace(tmp, out)
+            return out
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        return None
+
+    def sprite(self, thumbs, out):
+        # Vignettes de même taille (même source, même largeur) assemblées par le filtre tile
+        rows = math.ceil(len(thumbs) / self.columns)
+        tmp = temp_output(out)
+        cmd = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y"]
+        for thumb in thumbs:
+            cmd += ["-i", thumb]
+        cmd += ["-filter_complex", "".join(f"[{i}:v]" for i in range(len(thumbs)))
+                + f"concat=n={len(thumbs)}:v=1:a=0,tile={self.columns}x{rows}",
+                "-frames:v", "1", "-q:v", "3", tmp]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0 and os.path.isfile(tmp):
+            os.replace(tmp, out)
+            return out
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        return None
+
+    def generate(self, video, pool=None):
+        # Renvoie {"thumbnails": [...], "sprite": chemin} ; None si la vidéo est illisible
+        folder = self.folder_for(video)
+        sprite = os.path.join(folder, "sprite.jpg")
+        thumbs = [os.path.join(folder, f"thumb{i + 1:02d}.jpg") for i in range(self.count)]
+        if self.journal.is_done(video, sprite, self.params) and all(os.path.isfile(t) for t in thumbs):
+            return {"thumbnails": thumbs, "sprite": sprite, "cached": True}
+        with metrics.stage("preview", video, bytes_in=file_size(video), previews=self.count) as record:
+            duration = probe_for(self.ffmpeg_path).duration(video)
+            if not duration:
+                record.update(ok=False, error="durée inconnue")
+                self.log(f"⚠️ Aperçus impossibles (durée inconnue) : {os.path.basename(video)}")
+                return None
+            os.makedirs(folder, exist_ok=True)
+            times = self.timestamps(duration)
+            if pool is None:
+                with ThreadPoolExecutor(max_workers=min(self.workers, self.count)) as own:
+                    made = list(own.map(self.thumbnail, [video] * self.count, times, thumbs))
+            else:
+                made = [future.result() for future in
+                        [pool.submit(self.thumbnail, video, at, out) for at, out in zip(times, thumbs)]]
+            made = [thumb for thumb in made if thumb]
+            if not made or not self.sprite(made, sprite):
+                record.update(ok=False, error="aucune vignette")
+                self.log(f"❌ Aperçus : échec pour {os.path.basename(video)}")
+                return None
+            record["bytes_out"] = sum(file_size(path) for path in made + [sprite])
+            self.journal.record(video, sprite, self.params)
+            self.log(f"🖼️ {len(made)} vignette(s) + planche : {folder}")
+            return {"thumbnails": made, "sprite": sprite, "cached": False}
+
+    def generate_many(self, videos):
+        # Parallèle sur les fichiers et sur les vignettes d'un même fichier
+        videos = list(videos)
+        if not videos or not ffmpeg_ready(self.ffmpeg_path):
+            return {}
+        probe_for(self.ffmpeg_path).probe_many(videos)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool, \
+                ThreadPoolExecutor(max_workers=min(self.workers, len(videos))) as files:
+            return dict(zip(videos, files.map(lambda video: self.generate(video, pool), videos)))
@@ -0,0 +1,94 @@
+import os
+import json
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from cache import DiskCache
+from metrics import metrics
+from tools import ffprobe_for
+
+# ----- MEDIA PROBE -----
+class MediaProbe:
+    # Un seul `ffprobe -show_format -show_streams` par fichier, résultat gardé sur disque.
+    # L'entrée est invalidée dès que (inode, taille, mtime) change.
+    def __init__(self, ffmpeg_path, cache=None, workers=8):
+        self.ffmpeg_path = ffmpeg_path
+        self.cache = cache if cache is not None else DiskCache("probe", max_entries=20000)
+        self.workers = workers
+
+    @property
+    def ffprobe_path(self):
+        return ffprobe_for(self.ffmpeg_path)
+
+    @staticmethod
+    def fingerprint(path):
+        st = os.stat(path)
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def _cached(self, path, prefix, compute):
+        with metrics.stage(prefix.rstrip(":") or "probe", path) as record:
+            try:
+                key = prefix + os.path.abspath(path)
+                fp = self.fingerprint(path)
+            except OSError as e:
+                record.update(ok=False, error=str(e))
+                return None
+            cached = self.cache.get(key)
+            record["cached"] = bool(cached and cached.get("fingerprint") == fp)
+            if record["cached"]:
+                return cached["data"]
+            try:
+                data = compute()
+            except Exception as e:
+                record.update(ok=False, error=str(e))
+                return None
+            self.cache.set(key, {"fingerprint": fp, "data": data})
+            return data
+
+    def probe(self, path):
+        cmd = [self.ffprobe_path, "-v", "error", "-show_format", "-show_streams", "-of", "json", path]
+        return self._cached(path, "", lambda: json.loads(
+            subprocess.check_output(cmd, universal_newlines=True, encoding="utf-8")))
+
+    def keyframes(self, path):
+        # Horodatages des images clés de la première piste vidéo (lecture des paquets, sans décodage)
+        cmd = [self.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+
+        def compute():
+            times = []
+            for line in subprocess.check_output(cmd, universal_newlines=True).splitlines():
+                parts = line.strip().split(",")
+                if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+                    times.append(float(parts[0]))
+            return sorted(times)
+
+        return self._cached(path, "keyframes:", compute)
+
+    def probe_many(self, paths):
+        # Les lots sont sondés en parallèle avant de lancer les encodages
+        paths = list(paths)
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(paths))) as pool:
+            return dict(zip(paths, pool.map(self.probe, paths)))
+
+    @staticmethod
+    def duration_of(data):
+        try:
+            return float(data["format"]["duration"])
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    def duration(self, path):
+        return self.duration_of(self.probe(path))
+
+_probes = {}
+_probes_lock = threading.Lock()
+
+def probe_for(ffmpeg_path):
+    # Une instance (et une connexion au cache) par binaire ffmpeg
+    with _probes_lock:
+        if ffmpeg_path not in _probes:
+            _probes[ffmpeg_path] = MediaProbe(ffmpeg_path)
+        return _probes[ffmpeg_path]
@@ -0,0 +1,92 @@
+# ----- ENCODER PROFILES -----
+# Profils vitesse / qualité partagés par la compression et la conversion
+PROFILES = {
+    "fast": {
+        "codec": "libx264", "preset": "veryfast", "tune": "fastdecode", "threads": 0,
+        "crf": 26, "max_crf": 30, "audio_codec": "aac", "audio_bitrate": "128k",
+    },
+    "balanced": {
+        "codec": "libx264", "preset": "medium", "tune": None, "threads": 0,
+        "crf": 23, "max_crf": 28, "audio_codec": "aac", "audio_bitrate": "160k",
+    },
+    "archive": {
+        "codec": "libx265", "preset": "slow", "tune": None, "threads": 0,
+        "crf": 24, "max_crf": 30, "audio_codec": "aac", "audio_bitrate": "192k",
+    },
+    "av1": {
+        "codec": "libsvtav1", "preset": "6", "tune": "0", "threads": 0,
+        "crf": 32, "max_crf": 40, "audio_codec": "libopus", "audio_bitrate": "128k",
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+# Nom du codec tel que rapporté par ffprobe, pour vérifier la compatibilité du conteneur
+CODEC_NAMES = {"libx264": "h264", "libx265": "hevc", "libsvtav1": "av1", "aac": "aac", "libopus": "opus"}
+
+# Seul libx264 gère -pass/-passlogfile directement dans ffmpeg
+TWO_PASS_CODECS = {"libx264"}
+
+# Repli quand le ffmpeg installé n'a pas l'encodeur du profil (build LGPL, ffmpeg minimal...)
+VIDEO_FALLBACK = "libx264"
+AUDIO_FALLBACK = "aac"
+
+def get_profile(name, encoders=None):
+    # encoders : encodeurs disponibles (tools.encoders_for) ; None = pas d'adaptation
+    profile = PROFILES.get(name) or PROFILES[DEFAULT_PROFILE]
+    return adapt_profile(profile, encoders) if encoders else profile
+
+def adapt_profile(profile, encoders):
+    adapted = dict(profile)
+    if profile["codec"] not in encoders and VIDEO_FALLBACK in encoders:
+        # Réglages vidéo du profil par défaut : preset et CRF propres à x264
+        fallback = PROFILES[DEFAULT_PROFILE]
+        adapted.update({key: fallback[key] for key in ("codec", "preset", "tune", "crf", "max_crf")})
+    if profile["audio_codec"] not in encoders and AUDIO_FALLBACK in encoders:
+        adapted["audio_codec"] = AUDIO_FALLBACK
+    return adapted
+
+def video_args(profile, threads=None):
+    args = ["-c:v", profile["codec"], "-preset", str(profile["preset"])]
+    if profile["tune"]:
+        if profile["codec"] == "libsvtav1":
+            args += ["-svtav1-params", f"tune={profile['tune']}"]
+        else:
+            args += ["-tune", profile["tune"]]
+    if profile["codec"] == "libx265":
+        args += ["-tag:v", "hvc1"]
+    threads = profile["threads"] if threads is None else threads
+    if threads:
+        args += ["-threads", str(threads)]
+    return args
+
+def audio_args(profile, bitrate=None):
+    return ["-c:a", profile["audio_codec"], "-b:a", str(bitrate or profile["audio_bitrate"])]
+
+def conversion_args(name, video_ok, audio_ok, encoders=None):
+    # video_ok / audio_ok : codecs acceptés par le conteneur cible (None = tous)
+    profile = get_profile(name, encoders)
+    args = []
+    if video_ok is None or CODEC_NAMES[profile["codec"]] in video_ok:
+        args += video_args(profile) + ["-crf", str(profile["crf"])]
+    if audio_ok is None or CODEC_NAMES[profile["audio_codec"]] in audio_ok:
+        args += audio_args(profile)
+    return args
+
+# ----- AUDIO TARGETS -----
+# Encodeur et qualité par format audio ; "acodec" sert à préférer au téléchargement un flux
+# déjà dans ce codec (gardé tel quel, sans ré-encodage). "best" = codec d'origine.
+AUDIO_TARGETS = {
+    "best": {"encoder": None, "args": [], "acodec": None, "ydl_quality": None},
+    "mp3":  {"encoder": "libmp3lame", "args": ["-q:a", "2"], "acodec": "mp3", "ydl_quality": "2"},
+    "m4a":  {"encoder": "aac", "args": ["-b:a", "192k"], "acodec": "mp4a", "ydl_quality": "192"},
+    "aac":  {"encoder": "aac", "args": ["-b:a", "192k"], "acodec": "mp4a", "ydl_quality": "192"},
+    "opus": {"encoder": "libopus", "args": ["-b:a", "128k"], "acodec": "opus", "ydl_quality": "128"},
+    "ogg":  {"encoder": "libvorbis", "args": ["-q:a", "5"], "acodec": "vorbis", "ydl_quality": "5"},
+    "flac": {"encoder": "flac", "args": ["-compression_level", "5"], "acodec": "flac", "ydl_quality": None},
+    "wav":  {"encoder": "pcm_s16le", "args": [], "acodec": None, "ydl_quality": None},
+}
+DEFAULT_AUDIO_FORMAT = "best"
+
+def audio_target_args(fmt):
+    target = AUDIO_TARGETS[fmt]
+    return ["-vn", "-sn", "-c:a", target["encoder"], *target["args"]]
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+
+# ----- TREE SCAN -----
+def is_hidden(name):
+    # Fichiers cachés et sorties temporaires (.nom.part.ext) ignorés
+    return name.startswith(".")
+
+def scan(root, exts=None, recursive=True, exclude=None):
+    # Parcours os.scandir sans récursion Python : DirEntry garde le type (et le stat sous Windows)
+    exclude = os.path.normcase(os.path.abspath(exclude)) if exclude else None
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = sorted(entries, key=lambda e: e.name)
+        except OSError:
+            continue
+        subfolders = []
+        for entry in entries:
+            if is_hidden(entry.name):
+                continue
+            try:
+                if entry.is_dir():
+                    if recursive and os.path.normcase(os.path.abspath(entry.path)) != exclude:
+                        subfolders.append(entry.path)
+                elif entry.is_file() and (exts is None or entry.name.lower().endswith(exts)):
+                    yield entry
+            except OSError:
+                continue
+        stack.extend(reversed(subfolders))
+
+def mirror_path(src, root, dst, suffix):
+    # dst/<sous-dossiers de src relatifs à root>/<nom><suffix>
+    rel_dir = os.path.dirname(os.path.relpath(src, root))
+    name, _ = os.path.splitext(os.path.basename(src))
+    return os.path.join(dst, rel_dir, name + suffix)
+
+# ----- FILE INDEX -----
+class FileIndex:
+    # Fichiers déjà vus : chemin -> (taille, mtime_ns)
+    def __init__(self):
+        self.files = {}
+
+    @staticmethod
+    def stat_of(entry):
+        st = entry.stat()
+        return (st.st_size, st.st_mtime_ns)
+
+    def diff(self, entries):
+        # Fichiers nouveaux ou modifiés depuis le dernier passage ; les disparus sont oubliés
+        seen = {}
+        changed = []
+        for entry in entries:
+            try:
+                seen[entry.path] = self.stat_of(entry)
+            except OSError:
+                continue
+            if self.files.get(entry.path) != seen[entry.path]:
+                changed.append(entry.path)
+        self.files = seen
+        return changed
+
+    def update(self, path, stat):
+        self.files[path] = stat
+
+# ----- FOLDER WATCHER -----
+class FolderWatcher:
+    # Mode surveillance : les nouveaux fichiers sont traités dès qu'ils ne bougent plus pendant
+    # `settle` secondes (copie terminée). Événements du système (watchdog : inotify, FSEvents,
+    # ReadDirectoryChangesW) si disponible, sinon comparaison périodique des stats.
+    def __init__(self, root, exts, on_files, interval=2.0, settle=3.0, exclude=None, log=print, recursive=True):
+        self.root = root
+        self.exts = exts
+        self.recursive = recursive
+        self.on_files = on_files
+        self.interval = interval
+        self.settle = settle
+        self.exclude = self.subfolder(exclude, root)
+        self.log = log
+        self.index = FileIndex()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def subfolder(folder, root):
+        # Dossier exclu seulement s'il est strictement sous root : destination = root ou parent de root
+        # n'exclut rien (les sorties écrites dans root sont filtrées par l'appelant)
+        if not folder:
+            return None
+        folder = os.path.normcase(os.path.abspath(folder))
+        root = os.path.normcase(os.path.abspath(root))
+        return folder if folder.startswith(root.rstrip(os.sep) + os.sep) else None
+
+    def wanted(self, path):
+        name = os.path.basename(path)
+        if is_hidden(name) or not name.lower().endswith(self.exts):
+            return False
+        if self.exclude and os.path.normcase(os.path.abspath(path)).startswith(self.exclude + os.sep):
+            return False
+        parents = os.path.relpath(path, self.root).split(os.sep)[:-1]
+        if parents and not self.recursive:
+            return False
+        return not any(is_hidden(part) for part in parents)
+
+    def notify(self, path):
+        if self.wanted(path):
+            with self._lock:
+                self._pending.setdefault(path, None)
+
+    def _observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    watcher.notify(getattr(event, "dest_path", None) or event.src_path)
+
+        observer = Observer()
+        observer.schedule(Handler(), self.root, recursive=self.recursive)
+        observer.start()
+        return observer
+
+    def _poll(self):
+        for path in self.index.diff(scan(self.root, self.exts, self.recursive, self.exclude)):
+            self.notify(path)
+
+    def _ready(self):
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, last in list(self._pending.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._pending[path]
+                    continue
+                stat = (st.st_size, st.st_mtime_ns)
+                if last is None or last[0] != stat:
+                    self._pending[path] = (stat, now)
+                elif now - last[1] >= self.settle:
+                    del self._pending[path]
+                    self.index.update(path, stat)
+                    ready.append(path)
+        return sorted(ready)
+
+    def run(self, stop=None):
+        # Bloquant jusqu'à stop.set() ; l'état initial du dossier est supposé déjà traité
+        stop = stop or threading.Event()
+        self.index.diff(scan(self.root, self.exts, self.recursive, self.exclude))
+        observer = self._observer()
+        self.log("👀 Surveillance " + ("(événements système)" if observer else f"(scrutation toutes les {self.interval:g} s)")
+                 + f" : {self.root}")
+        try:
+            while not stop.wait(self.interval):
+                if observer is None:
+                    self._poll()
+                ready = self._ready()
+                if ready:
+                    self.on_files(ready)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -0,0 +1,172 @@
+import os
+import bisect
+import shlex
+import shutil
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from engine import TargetSizeEncoder, run_ffmpeg, progress_args
+from probe import probe_for
+from metrics import metrics
+from profiles import DEFAULT_PROFILE, TWO_PASS_CODECS, video_args, audio_args
+
+# ----- RUNNERS -----
+# Un runner exécute une commande ffmpeg et expose un nombre de places (slots).
+class LocalRunner:
+    def __init__(self, slots=None, threads=4):
+        self.threads = threads
+        self.slots = slots or max(1, (os.cpu_count() or 1) // threads)
+
+    def run(self, cmd, duration=None, on_progress=None):
+        return run_ffmpeg(cmd, duration, on_progress)
+
+class SSHRunner:
+    # Hôte distant joignable en ssh ; les chemins d'entrée/sortie doivent être sur un stockage partagé
+    def __init__(self, host, slots=1, threads=4, ffmpeg="ffmpeg"):
+        self.host = host
+        self.slots = slots
+        self.threads = threads
+        self.ffmpeg = ffmpeg
+
+    def run(self, cmd, duration=None, on_progress=None):
+        remote = shlex.join([self.ffmpeg] + cmd[1:])
+        return run_ffmpeg(["ssh", self.host, remote], duration, on_progress)
+
+# ----- SEGMENT PLAN -----
+def split_points(keyframes, duration, count, min_length=10.0):
+    # Coupe aux images clés les plus proches des frontières idéales duration*i/count
+    starts = [0.0]
+    for i in range(1, count):
+        ideal = duration * i / count
+        pos = bisect.bisect_left(keyframes, ideal)
+        if pos >= len(keyframes):
+            break
+        start = keyframes[pos]
+        if start - starts[-1] >= min_length and duration - start >= min_length:
+            starts.append(start)
+    ends = starts[1:] + [duration]
+    return list(zip(starts, ends))
+
+# ----- SEGMENTED ENCODER -----
+class SegmentedEncoder(TargetSizeEncoder):
+    # Même logique de taille cible, mais la vidéo est découpée aux images clés,
+    # encodée en parallèle (2 passes par segment si possible) puis recollée avec le démuxeur concat.
+    MIN_SEGMENT = 30.0
+
+    def __init__(self, ffmpeg_path, log=print, progress=None, profile=DEFAULT_PROFILE, runners=None, segments=None):
+        super().__init__(ffmpeg_path, log=log, progress=progress, profile=profile)
+        self.runners = runners or [LocalRunner()]
+        self.segments = segments
+        self.workdir = None
+        self.plan = None
+
+    def encode(self, input_file, output_file, size_bytes, duration):
+        slots = sum(runner.slots for runner in self.runners)
+        count = self.segments or slots * 2
+        count = int(min(count, duration // self.MIN_SEGMENT))
+        keyframes = probe_for(self.ffmpeg_path).keyframes(input_file) if count >= 2 else None
+        self.plan = split_points(keyframes, duration, count, self.MIN_SEGMENT) if keyframes else []
+        if len(self.plan) < 2:
+            self.log("Vidéo trop courte ou sans images clés exploitables : encodage en un seul bloc.")
+            self.plan = None
+            return super().encode(input_file, output_file, size_bytes, duration)
+
+        self.log(f"✂️ {len(self.plan)} segments sur {slots} emplacement(s) d'encodage")
+        folder, base = os.path.split(output_file)
+        # Dossier de travail à côté de la sortie : visible des hôtes distants sur stockage partagé
+        self.workdir = os.path.join(folder, f".{os.path.splitext(base)[0]}.segments")
+        os.makedirs(self.workdir, exist_ok=True)
+        try:
+            return super().encode(input_file, output_file, size_bytes, duration)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+    def encode_crf(self, input_file, output_file, duration, crf, video_bps=None, audio_bps=None):
+        if not self.plan:
+            return super().encode_crf(input_file, output_file, duration, crf, video_bps, audio_bps)
+        rate = ["-crf", str(crf)]
+        if video_bps:
+            rate += ["-maxrate", str(video_bps), "-bufsize", str(video_bps * 2)]
+        return self._encode_segments(input_file, output_file, duration, rate, audio_bps, two_pass=False)
+
+    def encode_two_pass(self, input_file, output_file, duration, video_bps, audio_bps):
+        if not self.plan:
+            return super().encode_two_pass(input_file, output_file, duration, video_bps, audio_bps)
+        two_pass = self.profile["codec"] in TWO_PASS_CODECS
+        rate = ["-b:v", str(video_bps)]
+        if not two_pass:
+            rate += ["-maxrate", str(int(video_bps * 1.5)), "-bufsize", str(video_bps * 2)]
+        return self._encode_segments(input_file, output_file, duration, rate, audio_bps, two_pass)
+
+    def _segment_cmds(self, input_file, index, start, end, rate, threads, two_pass):
+        out = os.path.join(self.workdir, f"seg{index:04d}.mp4")
+        base = [self.ffmpeg_path, "-y", *progress_args(), "-ss", f"{start:.6f}", "-i", input_file]
+        if index < len(self.plan) - 1:
+            base += ["-t", f"{end - start:.6f}"]
+        base += ["-an", "-sn", *video_args(self.profile, threads), *rate]
+        if not two_pass:
+            return out, [base + [out]]
+        prefix = os.path.join(self.workdir, f"pass{index:04d}")
+        cmds = [base + ["-pass", "2", "-passlogfile", prefix, out]]
+        # Stats de passe 1 gardées dans le dossier de travail pour les ré-encodages correctifs
+        if not os.path.isfile(prefix + "-0.log"):
+            cmds.insert(0, base + ["-pass", "1", "-passlogfile", prefix, "-f", "null", os.devnull])
+        return out, cmds
+
+    def _encode_segments(self, input_file, output_file, duration, rate, audio_bps, two_pass):
+        slots = queue.Queue()
+        for runner in self.runners:
+            for _ in range(runner.slots):
+                slots.put(runner)
+        done = {}
+        lock = threading.Lock()
+        failures = []
+        # Étape "encode" ouverte dans ce thread : les segments des threads du pool y sont rattachés
+        parent = metrics.current()
+
+        def report(index, fraction):
+            with lock:
+                done[index] = fraction
+                total = sum(done.values())
+            # La concaténation finale compte pour 5 %
+            self.progress(total / duration * 0.95)
+
+        def encode_segment(index):
+            start, end = self.plan[index]
+            length = end - start
+            runner = slots.get()
+            try:
+                out, cmds = self._segment_cmds(input_file, index, start, end, rate, runner.threads, two_pass)
+                for step, cmd in enumerate(cmds):
+                    share = 1 / len(cmds)
+
+                    def on_progress(progress, step=step, share=share):
+                        report(index, length * (step + progress.fraction) * share)
+
+                    with metrics.attach(parent):
+                        returncode, tail = runner.run(cmd, length, on_progress)
+                    if returncode != 0:
+                        failures.append((index, returncode, tail[-1] if tail else ""))
+                        return None
+                report(index, length)
+                return out
+            finally:
+                slots.put(runner)
+
+        with ThreadPoolExecutor(max_workers=slots.qsize()) as pool:
+            outputs = list(pool.map(encode_segment, range(len(self.plan))))
+        if failures:
+            for index, returncode, error in failures:
+                self.log(f"❌ Segment {index + 1} : code {returncode} {error}")
+            return failures[0][1]
+
+        list_file = os.path.join(self.workdir, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for out in outputs:
+                f.write("file '" + out.replace("'", "'\\''") + "'\n")
+        self.log("🔗 Assemblage des segments...")
+        cmd = [self.ffmpeg_path, "-y", *progress_args(), "-f", "concat", "-safe", "0", "-i", list_file,
+               "-i", input_file, "-map", "0:v:0", "-map", "1:a?", "-c:v", "copy",
+               *audio_args(self.profile, audio_bps), output_file]
+        return self._run(cmd, duration, 0.95, 0.05)
@@ -0,0 +1,198 @@
+import re
+import copy
+import json
+import time
+import threading
+import collections
+from contextlib import contextmanager
+
+# ----- INFO CACHE -----
+class InfoCache:
+    # Résultats bruts d'extract_info (process=False) : le choix des formats et le téléchargement
+    # réutilisent la même extraction. TTL court car les URLs directes des médias expirent.
+    def __init__(self, ttl=900, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            item = self._items.get(url)
+            if item is None:
+                return None
+            stored, info = item
+            if time.monotonic() - stored > self.ttl:
+                del self._items[url]
+                return None
+            self._items.move_to_end(url)
+        # process_ie_result modifie le dict : chaque appelant reçoit sa copie
+        return copy.deepcopy(info)
+
+    def set(self, url, info):
+        with self._lock:
+            self._items[url] = (time.monotonic(), copy.deepcopy(info))
+            self._items.move_to_end(url)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard(self, url):
+        with self._lock:
+            self._items.pop(url, None)
+
+# ----- BANDWIDTH BUDGET -----
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_rate(value):
+    # "10M", "500K", "1.5m" ou un nombre d'octets/s ; None ou 0 = illimité
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?)(?:i?B)?(?:/s)?\s*", str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"débit invalide : {value}")
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()]) or None
+
+# Protocoles servis par le téléchargeur de fragments de yt-dlp (plusieurs connexions par média)
+FRAGMENTED_PROTOCOLS = {"m3u8_native", "http_dash_segments", "dash_frag_urls", "ism", "f4m"}
+
+def is_fragmented(info):
+    formats = info.get("requested_formats") or [info]
+    return any(f.get("protocol") in FRAGMENTED_PROTOCOLS for f in formats)
+
+class BandwidthBudget:
+    # Débit global partagé entre les téléchargements en cours.
+    # HTTP simple (une seule connexion, y compris les formats DASH https de YouTube) : yt-dlp relit
+    # params["ratelimit"] à chaque bloc reçu, la part suit donc les arrivées et départs.
+    # HLS/DASH fragmenté : le téléchargeur de fragments copie params au démarrage. Sa part, divisée
+    # entre les fragments simultanés, est donc figée et réservée jusqu'à la fin du téléchargement.
+    def __init__(self, total_bps):
+        self.total = total_bps
+        self._active = []  # [params, part réservée ou None]
+        self._lock = threading.Lock()
+
+    def _entry(self, params):
+        return next((entry for entry in self._active if entry[0] is params), None)
+
+    def _rebalance(self):
+        live = [entry for entry in self._active if entry[1] is None]
+        if not live:
+            return
+        reserved = sum(entry[1] for entry in self._active if entry[1] is not None)
+        share = max(1024, int((self.total - reserved) / len(live)))
+        for params, _ in live:
+            params["ratelimit"] = share
+
+    def join(self, params):
+        with self._lock:
+            self._active.append([params, None])
+            self._rebalance()
+
+    def start(self, params, info):
+        # Appelé une fois le format choisi, juste avant le téléchargement
+        with self._lock:
+            entry = self._entry(params)
+            if entry is None or entry[1] is not None or not is_fragmented(info):
+                return
+            entry[1] = params.get("ratelimit") or 1024
+            fragments = max(1, params.get("concurrent_fragment_downloads") or 1)
+            params["ratelimit"] = max(1024, int(entry[1] / fragments))
+            self._rebalance()
+
+    def leave(self, params):
+        with self._lock:
+            entry = self._entry(params)
+            if entry is not None:
+                self._active.remove(entry)
+            params.pop("ratelimit", None)
+            self._rebalance()
+
+# ----- YOUTUBEDL SESSION -----
+class _Client:
+    # Une instance YoutubeDL et le hook de progression du job qui l'utilise en ce moment
+    def __init__(self, ydl_class, opts):
+        self.hook = None
+        opts = dict(opts, progress_hooks=[self._dispatch])
+        self.ydl = ydl_class(opts)
+
+    def _dispatch(self, d):
+        if self.hook:
+            self.hook(d)
+
+class YDLSession:
+    # Instances YoutubeDL réutilisées par jeu d'options (cookies lus une fois, extracteurs
+    # initialisés une fois, connexions HTTP conservées). Une instance ne sert qu'à un job à la fois.
+    def __init__(self, ttl=900, budget=None):
+        self.cache = InfoCache(ttl)
+        self.budget = budget
+        self._idle = {}
+        self._clients = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def profile_key(opts):
+        return json.dumps(opts, sort_keys=True, default=repr)
+
+    @contextmanager
+    def client(self, opts, hook=None):
+        key = self.profile_key(opts)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            client = idle.pop() if idle else None
+        if client is None:
+            # Import tardif : inutile pour la compression et la conversion
+            from yt_dlp import YoutubeDL
+            client = _Client(YoutubeDL, opts)
+            if self.budget:
+                self._watch_formats(client.ydl)
+            with self._lock:
+                self._clients.append(client)
+        client.hook = hook
+        try:
+            yield client.ydl
+        finally:
+            client.hook = None
+            with self._lock:
+                self._idle[key].append(client)
+
+    def _watch_formats(self, ydl):
+        # Le protocole n'est connu qu'après le choix du format : étape "before_dl" de yt-dlp
+        from yt_dlp.postprocessor import PostProcessor
+        budget = self.budget
+
+        class BudgetHook(PostProcessor):
+            def run(self, info):
+                budget.start(ydl.params, info)
+                return [], info
+
+        ydl.add_post_processor(BudgetHook(ydl), when="before_dl")
+
+    def info(self, ydl, url):
+        info = self.cache.get(url)
+        if info is None:
+            info = ydl.extract_info(url, download=False, process=False)
+            # Les playlists paresseuses contiennent des générateurs : jamais mises en cache
+            if info and info.get("_type", "video") == "video":
+                self.cache.set(url, info)
+        return info
+
+    def download(self, opts, url, hook=None):
+        with self.client(opts, hook) as ydl:
+            if self.budget:
+                self.budget.join(ydl.params)
+            try:
+                return ydl.process_ie_result(self.info(ydl, url), download=True)
+            except Exception:
+                # URLs directes peut-être expirées : nouvelle extraction au prochain essai
+                self.cache.discard(url)
+                raise
+            finally:
+                if self.budget:
+                    self.budget.leave(ydl.params)
+
+    def close(self):
+        with self._lock:
+            clients, self._clients, self._idle = self._clients, [], {}
+        for client in clients:
+            close = getattr(client.ydl, "close", None)
+            if close:
+                close()
@@ -0,0 +1,154 @@
+import os
+import sys
+import shutil
+import threading
+import subprocess
+from cache import DiskCache
+
+# ----- DISCOVERY -----
+# ffmpeg / ffprobe trouvés dans cet ordre : chemin configuré, PATH, copie fournie avec l'application
+TOOL_DIRS = ("", "ffmpeg", "bin", os.path.join("ffmpeg", "bin"))
+
+def executable(name):
+    return name + ".exe" if os.name == "nt" else name
+
+def bundled_dirs():
+    roots = [os.path.dirname(os.path.abspath(__file__))]
+    if getattr(sys, "frozen", False):
+        # Application empaquetée (PyInstaller...) : à côté de l'exécutable et dans l'archive extraite
+        roots.insert(0, os.path.dirname(sys.executable))
+        if getattr(sys, "_MEIPASS", None):
+            roots.insert(0, sys._MEIPASS)
+    return [os.path.join(root, sub) for root in roots for sub in TOOL_DIRS]
+
+def is_executable(path):
+    return bool(path) and os.path.isfile(path) and (os.name == "nt" or os.access(path, os.X_OK))
+
+def locate(name, configured=None):
+    # configured : fichier, ou dossier contenant l'outil
+    if configured:
+        if os.path.isdir(configured):
+            configured = os.path.join(configured, executable(name))
+        if is_executable(configured):
+            return os.path.abspath(configured)
+    path = shutil.which(name)
+    if path:
+        return os.path.abspath(path)
+    for folder in bundled_dirs():
+        candidate = os.path.join(folder, executable(name))
+        if is_executable(candidate):
+            return candidate
+    return ""
+
+def find_ffmpeg(configured=None):
+    return locate("ffmpeg", configured)
+
+def ffprobe_for(ffmpeg_path):
+    # ffprobe du même dossier que ffmpeg (même build), sinon recherche habituelle
+    folder, base = os.path.split(ffmpeg_path or "")
+    if base.lower().startswith("ffmpeg"):
+        sibling = os.path.join(folder, "ffprobe" + base[len("ffmpeg"):])
+        if is_executable(sibling):
+            return sibling
+    return locate("ffprobe")
+
+def is_ffmpeg(path):
+    return os.path.basename(path or "").lower().startswith("ffmpeg") and is_executable(path)
+
+# ----- CAPABILITIES -----
+def parse_encoders(text):
+    # " V....D libx264   libx264 H.264 ..." après la ligne " ------"
+    encoders = []
+    started = False
+    for line in text.splitlines():
+        if line.strip().startswith("---"):
+            started = True
+            continue
+        parts = line.split()
+        if started and len(parts) >= 2:
+            encoders.append(parts[1])
+    return encoders
+
+def parse_hwaccels(text):
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().endswith(":"):
+            return [name.strip() for name in lines[i + 1:] if name.strip()]
+    return []
+
+def parse_version(text):
+    banner = text.splitlines()[0] if text else ""
+    parts = banner.split()
+    version = parts[2] if len(parts) > 2 and parts[1] == "version" else ""
+    return banner, version
+
+class ToolCache:
+    # -version, -encoders et -hwaccels lancés une fois par binaire ; résultat sur disque,
+    # invalidé quand le binaire change (taille, mtime) : les jobs démarrent sans processus supplémentaire
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else DiskCache("tools", max_entries=50)
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    @staticmethod
+    def fingerprint(path):
+        st = os.stat(os.path.realpath(path))
+        return [st.st_size, st.st_mtime_ns]
+
+    @staticmethod
+    def _output(path, *args):
+        result = subprocess.run([path, "-hide_banner", *args], capture_output=True, text=True, timeout=30)
+        return result.stdout
+
+    def probe(self, path):
+        text = subprocess.run([path, "-version"], capture_output=True, text=True, timeout=30).stdout
+        banner, version = parse_version(text)
+        return {
+            "banner": banner,
+            "version": version,
+            "encoders": parse_encoders(self._output(path, "-encoders")),
+            "hwaccels": parse_hwaccels(self._output(path, "-hwaccels")),
+        }
+
+    def capabilities(self, ffmpeg_path):
+        # None si le binaire est absent ou ne s'exécute pas
+        if not is_executable(ffmpeg_path):
+            return None
+        key = os.path.abspath(ffmpeg_path)
+        try:
+            fp = self.fingerprint(key)
+        except OSError:
+            return None
+        with self._lock:
+            memory = self._memory.get(key)
+            if memory and memory["fingerprint"] == fp:
+                return memory
+            cached = self.cache.get(key)
+            if not cached or cached.get("fingerprint") != fp:
+                try:
+                    cached = dict(self.probe(key), fingerprint=fp)
+                except (OSError, subprocess.SubprocessError):
+                    return None
+                if not cached["banner"]:
+                    return None
+                self.cache.set(key, cached)
+            self._memory[key] = cached
+            return cached
+
+_tools = None
+_tools_lock = threading.Lock()
+
+def tool_cache():
+    global _tools
+    with _tools_lock:
+        if _tools is None:
+            _tools = ToolCache()
+        return _tools
+
+def capabilities(ffmpeg_path):
+    return tool_cache().capabilities(ffmpeg_path)
+
+def encoders_for(ffmpeg_path):
+    # Ensemble des encodeurs disponibles ; None si inconnu (aucune adaptation des profils)
+    caps = capabilities(ffmpeg_path)
+    return set(caps["encoders"]) if caps and caps["encoders"] else None
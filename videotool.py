@@ -0,0 +1,311 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import threading
+from engine import DownloadEngine, CompressionEngine, ConversionEngine
+from config import store_for
+from tools import find_ffmpeg
+from profiles import PROFILES, DEFAULT_PROFILE, AUDIO_TARGETS, DEFAULT_AUDIO_FORMAT
+from session import parse_rate
+from metrics import metrics
+
+# Point d'entrée sans interface graphique : n'importe jamais tkinter / customtkinter.
+#   python videotool.py download jobs.json --dest ./videos
+#   python videotool.py compress jobs.csv --size-mb 25
+#   python videotool.py convert jobs.json --format mp4
+#   python videotool.py preview jobs.json --count 12
+#   python videotool.py --job-profile nuit download jobs.json
+#   python videotool.py bench --profiles fast balanced --json bench.json
+#   python videotool.py bench --suite --json bench-suite.json
+
+def log(msg):
+    print(msg, flush=True)
+
+def read_manifest(path):
+    # JSON : liste de jobs (ou {"jobs": [...]}) ; CSV : une ligne d'en-tête puis un job par ligne
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                    for row in csv.DictReader(f)]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("jobs", [])
+    return [job if isinstance(job, dict) else {"url": job, "input": job} for job in data]
+
+def resolve_ffmpeg(path):
+    # --ffmpeg, puis config.json, puis PATH et copie fournie (tools.find_ffmpeg)
+    if path and os.path.isfile(path):
+        return path
+    return find_ffmpeg(store_for().get("ffmpeg_path")) or path or ""
+
+def build_previews(args, ffmpeg_path):
+    # Import tardif : étape optionnelle, seulement si des aperçus sont demandés
+    if not args.previews:
+        return None
+    from previews import PreviewGenerator
+    return PreviewGenerator(ffmpeg_path, count=args.previews, width=args.preview_width,
+                            columns=args.preview_columns, log=log)
+
+def cmd_download(args, ffmpeg_path):
+    batches = {}
+    for job in args.jobs:
+        playlist = str(job.get("playlist", args.playlist)).lower() in ("1", "true", "yes")
+        limit = int(job.get("limit", args.limit) or 0) or None
+        size_mb = job.get("size_mb", args.size_mb)
+        key = (job.get("dest", args.dest), job.get("resolution", args.resolution), job.get("type", args.type),
+               playlist, job.get("items", args.items) or None, limit, job.get("format", args.format) or None,
+               int(size_mb) if size_mb not in (None, "") else None, job.get("profile", args.profile))
+        batches.setdefault(key, []).extend(DownloadEngine.extract_urls(job.get("url", "")))
+    engine = DownloadEngine(ffmpeg_path, cookie_file=args.cookies, workers=args.workers,
+                            per_host=args.per_host, log=log, skip_done=not args.force,
+                            rate_limit=args.rate_limit, fragments=args.fragments, retries=args.retries,
+                            audio_format=args.audio_format, previews=build_previews(args, ffmpeg_path))
+    failed = 0
+    for (dest, res, typ, playlist, items, limit, out_fmt, size_mb, profile), urls in batches.items():
+        if not engine.download(urls, dest, res, typ, playlist=playlist, items=items, limit=limit,
+                               out_fmt=out_fmt, size_mb=size_mb, profile=profile):
+            failed += 1
+    engine.close()
+    return failed
+
+def build_runners(remotes, threads):
+    # Import tardif : seulement utile en mode segmenté
+    from segments import LocalRunner, SSHRunner
+    runners = [LocalRunner(threads=threads)]
+    for remote in remotes:
+        host, _, slots = remote.partition(":")
+        runners.append(SSHRunner(host, slots=int(slots or 1), threads=threads))
+    return runners
+
+def cmd_compress(args, ffmpeg_path):
+    failed = 0
+    runners = build_runners(args.remote, args.segment_threads) if args.segmented or args.remote else None
+    previews = build_previews(args, ffmpeg_path)
+    for job in args.jobs:
+        segmented = str(job.get("segmented", args.segmented or bool(args.remote))).lower() in ("1", "true", "yes")
+        engine = CompressionEngine(ffmpeg_path, log=log, profile=job.get("profile", args.profile),
+                                   segmented=segmented, runners=runners, previews=previews)
+        size_mb = int(job.get("size_mb", args.size_mb))
+        if not engine.compress(job.get("input", ""), job.get("dest", args.dest), size_mb):
+            failed += 1
+    return failed
+
+def cmd_convert(args, ffmpeg_path):
+    failed = 0
+    watchers = []
+    stop = threading.Event()
+    for job in args.jobs:
+        engine = ConversionEngine(ffmpeg_path, threads_per_job=args.threads, workers=args.workers, log=log,
+                                  profile=job.get("profile", args.profile))
+        inp = job.get("input", "")
+        out_fmt = job.get("format", args.format)
+        dest = job.get("dest", args.dest)
+        if os.path.isdir(inp) and args.watch:
+            watchers.append(threading.Thread(target=engine.watch, args=(inp, out_fmt, dest, stop, args.interval,
+                                                                        args.recursive)))
+            continue
+        if os.path.isdir(inp):
+            ok = engine.convert_folder(inp, out_fmt, dest, recursive=args.recursive)
+        else:
+            ok = engine.convert_file(inp, out_fmt, dest)
+        if not ok:
+            failed += 1
+    if watchers:
+        # Mode surveillance : tourne jusqu'à Ctrl+C
+        for thread in watchers:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in watchers):
+                for thread in watchers:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in watchers:
+                thread.join()
+    return failed
+
+def cmd_preview(args, ffmpeg_path):
+    from previews import PreviewGenerator
+    from scanner import scan
+    from engine import extensions
+    videos = []
+    for job in args.jobs:
+        inp = job.get("input", "")
+        if os.path.isdir(inp):
+            videos += [entry.path for entry in scan(inp, extensions("video"), recursive=args.recursive)]
+        elif os.path.isfile(inp):
+            videos.append(inp)
+        else:
+            log(f"⚠️ Entrée introuvable : {inp}")
+    generator = PreviewGenerator(ffmpeg_path, count=args.count, width=args.preview_width,
+                                 columns=args.preview_columns, workers=args.workers, log=log)
+    results = generator.generate_many(videos)
+    return sum(1 for video in videos if not results.get(video))
+
+def add_preview_options(p, count_flag="--previews", default=0):
+    p.add_argument(count_flag, type=int, default=default, metavar="N",
+                   help="vignettes par vidéo, plus une planche (0 = pas d'aperçus)")
+    p.add_argument("--preview-width", type=int, default=320, help="largeur des vignettes en pixels")
+    p.add_argument("--preview-columns", type=int, default=3, help="colonnes de la planche")
+
+def cmd_bench(args, ffmpeg_path):
+    # Import tardif : le banc d'essai n'est pas nécessaire aux autres commandes
+    from bench import profile_benchmark, run_suite, suite_failures
+    if args.suite is not None:
+        results = run_suite(ffmpeg_path, args.suite, args.files, args.duration, args.size, args.rate,
+                            args.profiles, log=log)
+        failed = suite_failures(results)
+    else:
+        results = profile_benchmark(ffmpeg_path, args.profiles, args.duration, args.size, args.rate, log=log)
+        failed = sum(1 for result in results if result["returncode"] != 0)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return failed
+
+# Réglages d'un profil de job -> options de la sous-commande ; les options passées explicitement l'emportent
+PROFILE_OPTIONS = {
+    "download": {"download_dest": "dest", "download_workers": "workers", "download_per_host": "per_host",
+                 "download_fragments": "fragments", "download_retries": "retries",
+                 "download_rate_limit": "rate_limit", "audio_format": "audio_format", "encoder_profile": "profile"},
+    "compress": {"compression_dest": "dest", "encoder_profile": "profile", "segmented_encoding": "segmented"},
+    "convert": {"conversion_dest": "dest", "conversion_threads": "threads", "conversion_workers": "workers",
+                "encoder_profile": "profile", "conversion_recursive": "recursive"},
+}
+
+def profile_defaults(command, values):
+    defaults = {}
+    for key, option in PROFILE_OPTIONS.get(command, {}).items():
+        value = values.get(key)
+        if value in (None, ""):
+            continue
+        # Chaîne : argparse lui applique le type de l'option (ex. parse_rate pour "10M")
+        defaults[option] = str(value) if key == "download_rate_limit" else value
+    return defaults
+
+def cmd_tools(args, ffmpeg_path):
+    from tools import ffprobe_for, capabilities
+    caps = capabilities(ffmpeg_path)
+    log(f"ffmpeg : {ffmpeg_path or 'introuvable'}")
+    log(f"ffprobe : {ffprobe_for(ffmpeg_path) or 'introuvable'}")
+    if not caps:
+        return 1
+    log(caps["banner"])
+    log(f"Accélération matérielle : {', '.join(caps['hwaccels']) or 'aucune'}")
+    wanted = sorted({profile["codec"] for profile in PROFILES.values()}
+                    | {profile["audio_codec"] for profile in PROFILES.values()})
+    log("Encodeurs des profils : " + ", ".join(f"{name} {'✅' if name in caps['encoders'] else '❌'}"
+                                                for name in wanted))
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="videotool",
+                                     description="VideoTool sans interface : téléchargement, compression, conversion.")
+    parser.add_argument("--ffmpeg", default="", help="chemin vers ffmpeg (défaut : config.json, PATH puis copie fournie)")
+    parser.add_argument("--metrics-jsonl", default="", help="ajouter une ligne JSON par étape de job à ce fichier")
+    parser.add_argument("--metrics-prom", default="", help="écrire les totaux au format texte Prometheus")
+    parser.add_argument("--profile-dir", default="", help="profil cProfile (.prof) de chaque job dans ce dossier")
+    parser.add_argument("--job-profile", default="", help="profil de job nommé de config.json (dossiers, concurrence...)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    parser.commands = sub.choices
+
+    p = sub.add_parser("download", help="télécharger les URLs d'un manifeste")
+    p.add_argument("manifest", help="fichier JSON ou CSV (colonnes : url, dest, resolution, type, playlist, items, limit, format, size_mb)")
+    p.add_argument("--dest", default=".", help="dossier de destination par défaut")
+    p.add_argument("--resolution", default="best", help="best, 1080p, 720p, ...")
+    p.add_argument("--type", default="video", choices=["audio", "video", "both"])
+    p.add_argument("--audio-format", default=DEFAULT_AUDIO_FORMAT, choices=list(AUDIO_TARGETS),
+                   help="format en mode audio (best = codec d'origine, sans ré-encodage)")
+    p.add_argument("--workers", type=int, default=4, help="téléchargements simultanés")
+    p.add_argument("--per-host", type=int, default=2, help="téléchargements simultanés par hôte")
+    p.add_argument("--cookies", default="cookieyt.txt", help="fichier cookies (utilisé s'il existe)")
+    p.add_argument("--force", action="store_true", help="retélécharger même les éléments déjà téléchargés")
+    p.add_argument("--rate-limit", type=parse_rate, default=None, metavar="DEBIT",
+                   help="débit global partagé entre les téléchargements, ex. 10M (octets/s)")
+    p.add_argument("--fragments", type=int, default=4, help="fragments DASH/HLS téléchargés en parallèle")
+    p.add_argument("--retries", type=int, default=3, help="nouvelles tentatives par URL (reprise du .part)")
+    p.add_argument("--format", default="", help="mode flux : transcoder pendant le téléchargement vers ce format")
+    p.add_argument("--size-mb", type=int, default=None, help="mode flux : taille cible en Mo")
+    p.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES), help="mode flux : profil d'encodage")
+    p.add_argument("--playlist", action="store_true", help="développer les playlists et chaînes")
+    p.add_argument("--items", default="", help="éléments de playlist à garder, ex. 1-10,15,20-")
+    p.add_argument("--limit", type=int, default=0, help="nombre maximal d'éléments par playlist (0 = tous)")
+    add_preview_options(p)
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("compress", help="compresser les vidéos d'un manifeste")
+    p.add_argument("manifest", help="fichier JSON ou CSV (colonnes : input, dest, size_mb)")
+    p.add_argument("--dest", default=".", help="dossier de destination par défaut")
+    p.add_argument("--size-mb", type=int, default=0, help="taille cible en Mo (0 = compression max)")
+    p.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES), help="profil d'encodage")
+    p.add_argument("--segmented", action="store_true", help="découper aux images clés et encoder en parallèle")
+    p.add_argument("--segment-threads", type=int, default=4, help="threads ffmpeg par segment")
+    p.add_argument("--remote", action="append", default=[], metavar="HOTE[:SLOTS]",
+                   help="hôte ssh supplémentaire pour les segments (stockage partagé requis)")
+    add_preview_options(p)
+    p.set_defaults(func=cmd_compress)
+
+    p = sub.add_parser("convert", help="convertir les fichiers ou dossiers d'un manifeste")
+    p.add_argument("manifest", help="fichier JSON ou CSV (colonnes : input, format, dest)")
+    p.add_argument("--dest", default=".", help="dossier de destination par défaut")
+    p.add_argument("--format", default="", help="format de sortie par défaut")
+    p.add_argument("--threads", type=int, default=2, help="threads ffmpeg par job")
+    p.add_argument("--workers", type=int, default=None, help="jobs simultanés (défaut : cœurs / threads)")
+    p.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES),
+                   help="profil d'encodage quand un transcodage est nécessaire")
+    p.add_argument("--recursive", action="store_true", help="inclure les sous-dossiers (arborescence reproduite)")
+    p.add_argument("--watch", action="store_true", help="surveiller les dossiers et convertir les nouveaux fichiers")
+    p.add_argument("--interval", type=float, default=2.0, help="période de scrutation en mode surveillance (s)")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("preview", help="vignettes et planche des vidéos d'un manifeste (images clés seulement)")
+    p.add_argument("manifest", help="fichier JSON ou CSV (colonne : input, fichier ou dossier)")
+    add_preview_options(p, "--count", default=9)
+    p.add_argument("--workers", type=int, default=None, help="extractions simultanées (défaut : nombre de cœurs)")
+    p.add_argument("--recursive", action="store_true", help="inclure les sous-dossiers")
+    p.set_defaults(func=cmd_preview)
+
+    p = sub.add_parser("bench", help="mesurer les profils d'encodage ou les moteurs sur des médias synthétiques")
+    p.add_argument("--profiles", nargs="*", choices=list(PROFILES), default=None, help="profils (défaut : tous)")
+    p.add_argument("--duration", type=int, default=5, help="durée de la mire en secondes")
+    p.add_argument("--size", default="1280x720", help="résolution de la mire")
+    p.add_argument("--rate", type=int, default=30, help="images par seconde")
+    p.add_argument("--suite", nargs="*", default=None, choices=["profiles", "compress", "convert", "download"],
+                   help="banc complet (sans valeur : toutes les suites) : fichiers/s, fps, octets/s, RSS, latence UI")
+    p.add_argument("--files", type=int, default=8, help="nombre de médias synthétiques pour --suite")
+    p.add_argument("--json", default="", help="écrire les résultats dans ce fichier JSON")
+    p.set_defaults(func=cmd_bench, manifest=None)
+
+    p = sub.add_parser("tools", help="afficher ffmpeg/ffprobe trouvés, version, accélérations et encodeurs")
+    p.set_defaults(func=cmd_tools, manifest=None)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.job_profile:
+        try:
+            values = store_for().profile(args.job_profile)
+        except KeyError:
+            log(f"❌ Profil de job inconnu : {args.job_profile} (disponibles : {', '.join(store_for().profiles()) or 'aucun'})")
+            return 2
+        parser.commands[args.command].set_defaults(**profile_defaults(args.command, values))
+        args = parser.parse_args(argv)
+    try:
+        args.jobs = read_manifest(args.manifest) if args.manifest else []
+    except (OSError, ValueError) as e:
+        log(f"❌ Manifeste illisible : {e}")
+        return 2
+    metrics.configure(args.metrics_jsonl, args.metrics_prom, args.profile_dir)
+    failed = args.func(args, resolve_ffmpeg(args.ffmpeg))
+    metrics.flush()
+    for stage, total in metrics.summary().items():
+        log(f"📊 {stage} : {total['ok']} ok, {total['failed']} en erreur, {total['seconds']:.1f}s, "
+            f"{total['bytes_out'] / (1024 * 1024):.1f} Mo écrits, attente {total['queue_wait']:.1f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())